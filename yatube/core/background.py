@@ -0,0 +1,56 @@
+"""Фоновая работа вне запроса.
+
+Задачи выполняются по очереди в одном потоке: SQLite допускает одного
+писателя, и больше потоков только ждали бы друг друга. Ожидание
+блокировки ограничено busy_timeout (см. SQLITE_PRAGMAS), а транзакции
+запросов берут блокировку записи сразу (core.db.backends.sqlite3),
+поэтому фоновые записи не обрывают их с 'database is locked'.
+
+При BACKGROUND_WORKERS = 0 потока нет, и задача выполняется сразу в
+вызывающем потоке. Так же - с базой SQLite в памяти (например, в
+тестах): потоки делят её через общий кэш, где блокировки таблиц не
+ждут busy_timeout, а сразу дают 'database table is locked'.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+executor = None
+if settings.BACKGROUND_WORKERS:
+    executor = ThreadPoolExecutor(
+        max_workers=settings.BACKGROUND_WORKERS,
+        thread_name_prefix='background',
+    )
+
+
+def run(func, *args):
+    """Выполняет задачу; ошибка записывается в лог, а не выбрасывается."""
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s%r не выполнена',
+                         func.__qualname__, args)
+
+
+def run_in_worker(func, *args):
+    close_old_connections()
+    try:
+        run(func, *args)
+    finally:
+        close_old_connections()
+
+
+def shares_memory_db():
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def submit(func, *args):
+    """Ставит func(*args) в очередь фонового потока."""
+    if executor is None or shares_memory_db():
+        run(func, *args)
+    else:
+        executor.submit(run_in_worker, func, *args)
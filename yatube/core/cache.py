@@ -0,0 +1,166 @@
+"""Версии ключей кэша.
+
+У каждой области (пост, группа, профиль...) есть версия, которая
+входит в ключи закэшированных фрагментов и хранится вместе с
+закэшированными страницами. При изменении данных версия меняется на
+новую, и старые записи перестают считаться свежими, поэтому кэш можно
+держать долго. Версия начинается со времени смены: по нему условные
+запросы узнают дату последнего изменения (см. version_time).
+
+Внутри транзакции версия меняется сразу и ещё раз после фиксации.
+Пока транзакция не зафиксирована, другие запросы видят старые строки
+и могли бы закэшировать их под новой версией; вторая смена делает
+такие записи устаревшими.
+"""
+import hashlib
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import has_vary_header
+
+VERSION_KEY = 'version:{}'
+PAGE_KEY = 'page:{}'
+LOCK_KEY = 'lock:{}'
+# Сколько секунд страницу может строить один запрос, прежде чем
+# блокировку возьмёт другой.
+LOCK_TIMEOUT = 30
+# Сколько ждать чужую страницу, если устаревшей в кэше нет.
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+
+
+def _new_version():
+    # Каждая версия уникальна, поэтому смена версии - обычная запись:
+    # incr на файловом кэше не атомарен, и два одновременных
+    # увеличения могли бы слиться в одно. Уникальность же не даёт
+    # повторить после вытеснения ключа номер, под которым уже лежат
+    # старые записи.
+    return f'{time.time():.6f}:{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """Когда версия сменилась; None для версии без времени."""
+    stamp, separator, _ = str(version).partition(':')
+    if not separator:
+        return None
+    return datetime.fromtimestamp(float(stamp), timezone.utc)
+
+
+def get_versions(scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_version(scope):
+    return get_versions([scope])[0]
+
+
+def _set_versions(scopes):
+    cache.set_many(
+        {VERSION_KEY.format(scope): _new_version() for scope in scopes},
+        None,
+    )
+
+
+def bump_version(*scopes):
+    _set_versions(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _set_versions(scopes))
+
+
+def page_cache_key(request):
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = f'{request.get_full_path()}|{viewer}'
+    return PAGE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def _is_fresh(entry, versions, timeout):
+    if entry is None:
+        return False
+    entry_versions, created, _ = entry
+    return entry_versions == versions and time.time() - created < timeout
+
+
+def _cached_response(entry, versions):
+    response = entry[2]
+    # Отдана из кэша страниц, а не собрана видом (см. bench_cache)
+    response.from_page_cache = True
+    # Страница собрана по старым данным (см. core.http.conditional)
+    response.stale = entry[0] != versions
+    return response
+
+
+def _is_cacheable(request, response):
+    """Можно ли отдать страницу другим читателям с тем же ключом.
+
+    Страница с CSRF-токеном или Set-Cookie принадлежит одному
+    клиенту. Гости делят ключ 'anon', поэтому их страница, которая
+    зависит от cookie (Vary: Cookie), тоже не кэшируется.
+    """
+    if (response.status_code != 200 or response.streaming
+            or request.META.get('CSRF_COOKIE_USED') or response.cookies):
+        return False
+    return (request.user.is_authenticated
+            or not has_vary_header(response, 'Cookie'))
+
+
+def _wait_for_page(key, lock, timeout):
+    # Ждём, пока страница не появится или блокировку не снимут:
+    # страницу с CSRF-токеном в кэш так и не положат.
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None or not cache.has_key(lock):
+            return entry
+    return None
+
+
+def versioned_cache_page(scopes, soft_timeout, hard_timeout=None):
+    """Кэширует страницу вместе с версиями областей, от которых она зависит.
+
+    scopes(request, *args, **kwargs) возвращает эти области. Страница
+    свежая soft_timeout секунд и пока версии не изменились. Устаревшую
+    страницу перестраивает один запрос, взявший блокировку, а остальные
+    до hard_timeout получают старую. Страницы с CSRF-токеном или
+    cookie не кэшируются (см. _is_cacheable).
+    """
+    hard_timeout = max(hard_timeout or soft_timeout, soft_timeout)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            versions = get_versions(scopes(request, *args, **kwargs))
+            key = page_cache_key(request)
+            entry = cache.get(key)
+            if _is_fresh(entry, versions, soft_timeout):
+                return _cached_response(entry, versions)
+            lock = LOCK_KEY.format(key)
+            if not cache.add(lock, True, LOCK_TIMEOUT):
+                # Страницу уже строит другой запрос
+                if entry is None:
+                    entry = _wait_for_page(key, lock, WAIT_TIMEOUT)
+                if entry is not None:
+                    return _cached_response(entry, versions)
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+                if _is_cacheable(request, response):
+                    cache.set(key, (versions, time.time(), response),
+                              hard_timeout)
+            finally:
+                cache.delete(lock)
+            return response
+        return wrapper
+    return decorator
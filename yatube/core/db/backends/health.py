@@ -0,0 +1,37 @@
+"""Проверка постоянных соединений, как CONN_HEALTH_CHECKS в Django 4.1.
+
+Соединение, пережившее запрос (CONN_MAX_AGE), могло оборваться:
+перезапуск базы, таймаут на сервере. Без проверки первый запрос после
+разрыва упал бы с ошибкой. Проверка (is_usable) делается не в начале
+каждого запроса, а при первом обращении к базе в нём: запросы без
+обращений к базе её не платят. Новое соединение не проверяется.
+Включается ключом CONN_HEALTH_CHECKS в настройках базы.
+"""
+
+
+class HealthChecksMixin:
+    health_check_done = False
+
+    def connect(self):
+        # До super(): обработчики connection_created уже делают запросы
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце запроса (close_old_connections)
+        if self.connection is not None:
+            self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        if (self.connection is None
+                or self.health_check_done
+                or not self.settings_dict.get('CONN_HEALTH_CHECKS')):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,120 @@
+"""PostgreSQL с пулом соединений в процессе.
+
+Соединение не закрывается в конце запроса, а возвращается в пул
+psycopg2 и достаётся следующему запросу любого потока - без
+установки TCP-соединения и авторизации. Размер пула и время ожидания
+свободного соединения задаются ключом POOL в настройках базы:
+
+    'default': {
+        'ENGINE': 'core.db.backends.postgresql_pool',
+        ...
+        'POOL': {'MIN_SIZE': 1, 'MAX_SIZE': 10, 'TIMEOUT': 30},
+    }
+
+CONN_MAX_AGE с этим бэкендом всегда 0: соединение уходит в пул после
+каждого запроса, а не держится потоком. С CONN_HEALTH_CHECKS
+соединение, взятое из пула, проверяется перед выдачей.
+
+Пул у каждого процесса свой: после fork() создаётся новый.
+"""
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import Error
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from core.db.backends.health import HealthChecksMixin
+
+POOLS = {}
+POOLS_LOCK = threading.Lock()
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """Пул, в котором запрос ждёт свободное соединение.
+
+    ThreadedConnectionPool.getconn() сразу бросает PoolError, когда
+    заняты все maxconn соединений. Здесь поток ждёт, пока соединение
+    вернут, и ошибка будет, только если ждать пришлось дольше timeout
+    секунд.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+
+    def getconn(self, key=None):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolError(
+                f'Нет свободного соединения за {self.timeout} с')
+        try:
+            return super().getconn(key)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self.slots.release()
+
+
+def is_usable(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        # Без autocommit SELECT открыл транзакцию
+        connection.rollback()
+    except Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(HealthChecksMixin, base.DatabaseWrapper):
+    def __init__(self, settings_dict, *args, **kwargs):
+        # Соединение, которое поток держит между запросами, простаивало
+        # бы, пока другие потоки ждут пул
+        settings_dict = {**settings_dict, 'CONN_MAX_AGE': 0}
+        super().__init__(settings_dict, *args, **kwargs)
+
+    @property
+    def pool(self):
+        key = (os.getpid(), self.alias, self.settings_dict['NAME'])
+        with POOLS_LOCK:
+            if key not in POOLS:
+                options = self.settings_dict.get('POOL', {})
+                POOLS[key] = BlockingConnectionPool(
+                    options.get('MIN_SIZE', 1), options.get('MAX_SIZE', 10),
+                    options.get('TIMEOUT', 30),
+                    **self.get_connection_params(),
+                )
+            return POOLS[key]
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.getconn()
+        if (self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not is_usable(connection)):
+            # Соединение оборвалось, пока лежало в пуле
+            self.pool.putconn(connection, close=True)
+            connection = self.pool.getconn()
+        # Как в base.DatabaseWrapper.get_new_connection: уровень
+        # изоляции нужен до того, как Django включит autocommit.
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Сломанное соединение закрывается, а не возвращается в пул
+        broken = self.errors_occurred and not self.is_usable()
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection, close=broken)
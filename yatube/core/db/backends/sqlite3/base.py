@@ -0,0 +1,19 @@
+"""SQLite, в котором транзакции сразу берут блокировку записи.
+
+Обычный BEGIN откладывает блокировку до первой записи. Если между
+чтением и записью в транзакции базу изменил другой поток (например,
+фоновый из core.background), SQLite не ждёт busy_timeout, а сразу
+отвечает 'database is locked'. BEGIN IMMEDIATE ждёт блокировку в
+начале транзакции, пока её не отпустит другой писатель.
+
+Постоянные соединения проверяются при первом обращении в запросе
+(core.db.backends.health).
+"""
+from django.db.backends.sqlite3 import base
+
+from core.db.backends.health import HealthChecksMixin
+
+
+class DatabaseWrapper(HealthChecksMixin, base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
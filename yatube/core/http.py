@@ -0,0 +1,44 @@
+"""Условные GET-запросы.
+
+conditional(freshness) отвечает 304 Not Modified, если у клиента уже
+есть актуальная версия страницы, - до того как вид сделает запросы
+страницы и отрисует шаблон. freshness(request, *args, **kwargs)
+должна быть дешёвой: она возвращает пару (ключ свежести, время
+последнего изменения или None), а ETag - хэш ключа.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(key):
+    return quote_etag(hashlib.md5(repr(key).encode()).hexdigest())
+
+
+def conditional(freshness):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key, last_modified = freshness(request, *args, **kwargs)
+            etag = make_etag(key)
+            timestamp = last_modified and int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp)
+            if response is not None:
+                response['ETag'] = etag
+                return response
+            response = view(request, *args, **kwargs)
+            # Устаревшая страница из кэша не соответствует ключу, и
+            # с ним клиент так и остался бы со старой страницей.
+            if (response.status_code == 200
+                    and not getattr(response, 'stale', False)):
+                response.setdefault('ETag', etag)
+                if timestamp:
+                    response.setdefault('Last-Modified', http_date(timestamp))
+            return response
+        return wrapper
+    return decorator
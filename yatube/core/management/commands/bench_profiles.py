@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+PROFILES = ('dev', 'prod')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время запроса в профилях настроек dev и prod. '
+            'Каждый профиль запускается в отдельном процессе; страница '
+            'отдаётся из кэша страниц, поэтому в замер входят в основном '
+            'middleware и отладочные инструменты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--url', default='/')
+        parser.add_argument('--measure', action='store_true',
+                            help=argparse.SUPPRESS)
+
+    def measure(self, url, requests):
+        # Адрес из INTERNAL_IPS: в dev debug toolbar работает, как у
+        # разработчика
+        client = Client(REMOTE_ADDR='127.0.0.1')
+        client.get(url)
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            'middleware': len(settings.MIDDLEWARE),
+            'p50_ms': statistics.median(timings),
+            'p99_ms': timings[int(len(timings) * 0.99) - 1],
+        }
+
+    def run_profile(self, profile, options):
+        env = {**os.environ, 'YATUBE_ENV': profile}
+        # Только для замера: prod не запускается без ключа
+        env.setdefault('YATUBE_SECRET_KEY', 'bench-profiles')
+        output = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+             'bench_profiles', '--measure', '--url', options['url'],
+             '--requests', str(options['requests'])],
+            env=env, check=True, stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        return json.loads(output.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            self.stdout.write(json.dumps(
+                self.measure(options['url'], options['requests'])))
+            return
+        results = {}
+        for profile in PROFILES:
+            results[profile] = result = self.run_profile(profile, options)
+            self.stdout.write(
+                f'{profile}: middleware {result["middleware"]}, '
+                f'p50 {result["p50_ms"]:.2f} мс, '
+                f'p99 {result["p99_ms"]:.2f} мс'
+            )
+        dev, prod = results['dev']['p50_ms'], results['prod']['p50_ms']
+        self.stdout.write(f'prod быстрее dev в {dev / prod:.1f} раза')
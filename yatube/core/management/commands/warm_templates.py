@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = ('Разбирает шаблоны проекта: проверяет, что они собираются, '
+            'и показывает, сколько стоит прогрев при запуске процесса '
+            '(его делает wsgi.py).')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        compiled = warm_templates(force=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stdout.write(
+            f'Разобрано шаблонов: {compiled} за {elapsed:.0f} мс')
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_LENGTH = 32
+# Имя из хэша, возможно с суффиксом варианта: 3f2a..._640w.jpg
+HASHED_NAME = re.compile(rf'(^|/)[0-9a-f]{{{HASH_LENGTH}}}(_\w+)?\.\w+$')
+
+
+def is_hashed(name):
+    """Файл под таким именем никогда не меняется."""
+    return bool(HASHED_NAME.search(name))
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - хэш его содержимого.
+
+    Одинаковые загрузки ложатся в один файл, у них общие миниатюры,
+    а содержимое файла под именем не меняется, и его можно кэшировать
+    навсегда.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory, digest.hexdigest()[:HASH_LENGTH] + extension)
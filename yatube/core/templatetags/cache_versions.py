@@ -0,0 +1,11 @@
+from django import template
+
+from core.cache import get_version
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(*parts):
+    """Версия области кэша: {% cache_version 'post' post.pk as version %}."""
+    return get_version(':'.join(str(part) for part in parts))
@@ -1,4 +1,10 @@
 from django.shortcuts import render
+from django.views.static import serve
+
+from .storage import is_hashed
+
+# Год - наибольший срок, который понимают браузеры и прокси
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
 
 
 def page_not_found(request, exception):
@@ -11,3 +17,15 @@ def csrf_failure(request, reason=''):
 
 def internal_server_error(request):
     return render(request, 'core/500.html', {'path': request.path}, status=500)
+
+
+def serve_media(request, path, document_root=None):
+    """Отдаёт медиафайлы; файлы с хэшем в имени кэшируются навсегда.
+
+    В бою то же правило задаётся в настройках веб-сервера.
+    """
+    response = serve(request, path, document_root=document_root)
+    if is_hashed(path):
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+    return response
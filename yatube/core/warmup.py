@@ -0,0 +1,71 @@
+"""Разбор шаблонов проекта при запуске.
+
+С cached.Loader шаблон разбирается при первом обращении к нему.
+warm_templates() делает это заранее для шаблонов из DIRS и из
+каталогов templates приложений проекта, и первые запросы после
+запуска процесса не платят за разбор. Шаблоны Django и сторонних
+пакетов (админка, debug toolbar) разбираются по первому обращению.
+
+Прогрев вызывает только wsgi.py и команда warm_templates: процессам
+manage.py (миграции, тесты, фоновые команды) он не нужен.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+from django.template.utils import get_app_template_dirs
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+logger = logging.getLogger(__name__)
+
+
+def project_template_dirs(engine):
+    """DIRS движка и каталоги templates приложений внутри BASE_DIR."""
+    base = os.path.join(settings.BASE_DIR, '')
+    return [*engine.dirs, *(
+        directory for directory in get_app_template_dirs('templates')
+        if directory.startswith(base)
+    )]
+
+
+def template_names(engine):
+    names = set()
+    for directory in project_template_dirs(engine):
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.endswith(TEMPLATE_EXTENSIONS):
+                    path = os.path.relpath(os.path.join(root, file), directory)
+                    names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def is_cached(engine):
+    return any(isinstance(loader, CachedLoader)
+               for loader in engine.template_loaders)
+
+
+def warm_templates(force=False):
+    """Разбирает шаблоны проекта и возвращает число разобранных.
+
+    Без force - только для движков с cached.Loader: в остальных
+    разобранный шаблон всё равно не сохранится.
+    """
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        if not (force or is_cached(engine)):
+            continue
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception('Ошибка в шаблоне %s', name)
+            else:
+                compiled += 1
+    return compiled
@@ -1,5 +1,81 @@
-from django.contrib import admin
-from .models import Post, Group, Comment, Follow
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.template.response import TemplateResponse
+from .models import Post, Group, Comment, Follow, User
+from . import moderation
+from .paginators import EstimatedCountPaginator
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """Поле с поиском, которое не загружает выбранный объект заново.
+
+    Объект уже пришёл вместе со строкой списка (list_select_related),
+    а AutocompleteSelect запрашивал бы его для каждой строки.
+    """
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        loaded = self.loaded
+        if loaded is None or [str(v) for v in value] != [str(loaded.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, loaded.pk, self.choices.field.label_from_instance(loaded),
+            True, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        # Админка оборачивает виджет в RelatedFieldWidgetWrapper
+        getattr(widget, 'widget', widget).loaded = self.instance.group
+
+
+class PostActionForm(ActionForm):
+    group = forms.SlugField(
+        label='Группа (slug)', required=False,
+        help_text='Пусто - убрать из групп.')
+    username = forms.CharField(label='Автор', required=False)
+
+
+def delete_authors_content(modeladmin, request, queryset):
+    # Список, а не подзапрос: выбранные строки удаляются по ходу
+    user_ids = list(queryset.order_by().values_list(
+        'author_id', flat=True).distinct())
+    if request.POST.get('post') != 'yes':
+        # Сначала страница подтверждения, как у delete_selected
+        counts = moderation.user_content_counts(user_ids)
+        return TemplateResponse(
+            request, 'admin/posts/delete_authors_content.html', {
+                **modeladmin.admin_site.each_context(request),
+                'title': 'Удалить всё содержимое авторов?',
+                'opts': modeladmin.model._meta,
+                'authors': [
+                    (user, *counts[user.pk]) for user
+                    in User.objects.filter(pk__in=user_ids).order_by(
+                        'username')
+                ],
+                'action': request.POST.get('action'),
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+                'selected': request.POST.getlist(
+                    helpers.ACTION_CHECKBOX_NAME),
+                'select_across': request.POST.get('select_across', '0'),
+            })
+    comments, posts = moderation.delete_user_content(user_ids)
+    modeladmin.message_user(
+        request, f'Удалено постов: {posts}, комментариев: {comments}.')
+
+
+delete_authors_content.short_description = (
+    'Удалить все посты и комментарии авторов выбранных')
+delete_authors_content.allowed_permissions = ('delete',)
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,9 +84,90 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    # Автор и группа приходят одним JOIN, а не запросом на строку
+    list_select_related = ('author', 'group')
+    # Поля с поиском вместо выпадающих списков всех групп и авторов
+    autocomplete_fields = ('author', 'group')
+    # Шаблон списка выводит даты тегом indexed_date_hierarchy: поиском
+    # по индексу post_pub_date_idx вместо полного просмотра
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('move_to_group', 'reassign_to_author', delete_authors_content)
+
+    def move_to_group(self, request, queryset):
+        slug = request.POST.get('group')
+        group = None
+        if slug:
+            group = Group.objects.filter(slug=slug).first()
+            if group is None:
+                self.message_user(request, f'Нет группы {slug}.',
+                                  messages.ERROR)
+                return
+        moved = moderation.move_posts(queryset, group)
+        self.message_user(request, f'Перенесено постов: {moved}.')
+
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def reassign_to_author(self, request, queryset):
+        username = request.POST.get('username')
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            self.message_user(request, f'Нет пользователя {username}.',
+                              messages.ERROR)
+            return
+        reassigned = moderation.reassign_posts(queryset, author)
+        self.message_user(request, f'Передано постов: {reassigned}.')
+
+    reassign_to_author.short_description = 'Передать автору'
+    reassign_to_author.allowed_permissions = ('change',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs.setdefault('widget', LoadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    search_fields = ('text',)
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_comments', delete_authors_content)
+
+    def delete_comments(self, request, queryset):
+        deleted = moderation.delete_comments(queryset)
+        self.message_user(request, f'Удалено комментариев: {deleted}.')
+
+    delete_comments.short_description = 'Удалить выбранные пачками'
+    delete_comments.allowed_permissions = ('delete',)
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
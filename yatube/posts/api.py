@@ -0,0 +1,112 @@
+"""JSON для мобильных клиентов: те же ленты, что и на страницах.
+
+Ответы поддерживают условные GET-запросы: клиент присылает ETag
+(If-None-Match) или дату (If-Modified-Since) из прошлого ответа и,
+если лента не изменилась, получает 304 без тела. Проверка стоит
+одного запроса по индексу (см. posts.freshness).
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.http import conditional
+
+from .freshness import (follow_freshness, group_freshness, index_freshness,
+                        post_freshness, profile_freshness)
+from .models import Comment, Group, Post, User
+from .timeline import timeline_posts
+from .views import get_page
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': comment.author.username,
+    }
+
+
+def page_data(page_obj):
+    data = {
+        'results': [post_data(post) for post in page_obj],
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+    }
+    if getattr(page_obj.paginator, 'cursor_based', False):
+        data['next_cursor'] = page_obj.next_cursor
+        data['previous_cursor'] = page_obj.previous_cursor
+    else:
+        data['page'] = page_obj.number
+        data['num_pages'] = page_obj.paginator.num_pages
+    return data
+
+
+def authenticated(view):
+    """403 анонимам - до условной проверки, а не после неё."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Нужно войти на сайт.'}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def feed_response(request, post_list, **extra):
+    return JsonResponse({**extra, **page_data(get_page(request, post_list))})
+
+
+@conditional(index_freshness)
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@conditional(group_freshness)
+def group_post(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, Post.objects.feed().filter(group=group),
+        group={'slug': group.slug, 'title': group.title,
+               'posts_count': group.posts_count},
+    )
+
+
+@conditional(profile_freshness)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    return feed_response(
+        request, author.posts.feed(),
+        author={'username': author.username,
+                'posts_count': author.profile.posts_count},
+    )
+
+
+@conditional(post_freshness)
+def post_detail(request, pk):
+    post = get_object_or_404(Post.objects.feed(), pk=pk)
+    comments = Comment.objects.filter(post=post).select_related('author')
+    return JsonResponse({
+        **post_data(post),
+        'comments': [comment_data(comment) for comment in comments],
+    })
+
+
+@authenticated
+@conditional(follow_freshness)
+def follow_index(request):
+    return feed_response(request, timeline_posts(request.user))
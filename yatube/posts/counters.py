@@ -0,0 +1,120 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются одним UPDATE с F-выражением, поэтому параллельные
+запросы не теряют приращений. reconcile() пересчитывает всё заново,
+если счётчики разошлись с данными.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Profile, User
+
+from .models import Comment, Follow, Group, Post
+
+
+def _add(queryset, field, delta):
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def post_created(post):
+    _add(Profile.objects.filter(user_id=post.author_id), 'posts_count', 1)
+    group_changed(None, post.group_id)
+
+
+def post_deleted(post):
+    _add(Profile.objects.filter(user_id=post.author_id), 'posts_count', -1)
+    group_changed(post.group_id, None)
+
+
+def group_changed(old_group_id, new_group_id):
+    if old_group_id == new_group_id:
+        return
+    if old_group_id is not None:
+        _add(Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+    if new_group_id is not None:
+        _add(Group.objects.filter(pk=new_group_id), 'posts_count', 1)
+
+
+def comment_created(comment):
+    _add(Post.objects.filter(pk=comment.post_id), 'comments_count', 1)
+
+
+def comment_deleted(comment):
+    _add(Post.objects.filter(pk=comment.post_id), 'comments_count', -1)
+
+
+def follow_created(follow):
+    _add(Profile.objects.filter(user_id=follow.user_id),
+         'following_count', 1)
+    _add(Profile.objects.filter(user_id=follow.author_id),
+         'followers_count', 1)
+
+
+def follow_deleted(follow):
+    _add(Profile.objects.filter(user_id=follow.user_id),
+         'following_count', -1)
+    _add(Profile.objects.filter(user_id=follow.author_id),
+         'followers_count', -1)
+
+
+def posts_added(authors=None, groups=None):
+    """Сдвигает счётчики постов после массовых изменений.
+
+    authors и groups - словари {id: на сколько изменилось}; на каждого
+    автора и группу один UPDATE.
+    """
+    for user_id, delta in (authors or {}).items():
+        _add(Profile.objects.filter(user_id=user_id), 'posts_count', delta)
+    for group_id, delta in (groups or {}).items():
+        if group_id is not None:
+            _add(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def comments_added(posts):
+    """То же для счётчиков комментариев: posts - {id поста: изменение}."""
+    for post_id, delta in posts.items():
+        _add(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _actual_count(source, field, key):
+    return Coalesce(Subquery(
+        source.objects.filter(
+            **{field: OuterRef(key)}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def follows_added(user_id, author_ids):
+    """Сдвигает счётчики после массовой подписки одного читателя."""
+    _add(Profile.objects.filter(user_id=user_id), 'following_count',
+         len(author_ids))
+    _add(Profile.objects.filter(user_id__in=author_ids),
+         'followers_count', 1)
+
+
+COUNTERS = (
+    (Profile, 'posts_count', Post, 'author'),
+    (Profile, 'followers_count', Follow, 'author'),
+    (Profile, 'following_count', Follow, 'user'),
+    (Group, 'posts_count', Post, 'group'),
+    (Post, 'comments_count', Comment, 'post'),
+)
+
+
+def reconcile():
+    """Пересчитывает все счётчики и возвращает число исправленных строк."""
+    Profile.objects.bulk_create(
+        (Profile(user_id=pk) for pk in User.objects.filter(
+            profile__isnull=True).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    fixed = {}
+    for model, counter, source, field in COUNTERS:
+        key = 'user_id' if model is Profile else 'pk'
+        actual = _actual_count(source, field, key)
+        fixed[f'{model._meta.model_name}.{counter}'] = model.objects.annotate(
+            actual=actual
+        ).exclude(**{counter: F('actual')}).update(**{counter: actual})
+    return fixed
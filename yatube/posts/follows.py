@@ -0,0 +1,59 @@
+"""Подписки, в том числе на много авторов сразу.
+
+follow() вставляет подписки запросом INSERT ... ON CONFLICT DO NOTHING
+RETURNING без предварительного SELECT: база пропускает уже
+существующие подписки и возвращает только созданные. Поэтому
+повторный или одновременный клик не создаёт дубликатов и не падает,
+а счётчики, ленты и версии кэша профилей меняются только для новых
+подписок. Вставка идёт в обход ORM, и сигналов нет - всё это
+делается явно.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from . import counters, signals, timeline
+from .models import Follow
+
+
+def _insert(user_id, author_ids):
+    """Вставляет подписки и возвращает id авторов созданных строк."""
+    table = connection.ops.quote_name(Follow._meta.db_table)
+    user_column = Follow._meta.get_field('user').column
+    author_column = Follow._meta.get_field('author').column
+    author_ids = iter(author_ids)
+    created = []
+    while True:
+        batch = list(islice(author_ids, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return created
+        values = ', '.join(['(%s, %s)'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({user_column}, {author_column}) '
+                f'VALUES {values} ON CONFLICT DO NOTHING '
+                f'RETURNING {author_column}',
+                [value for author_id in batch
+                 for value in (user_id, author_id)],
+            )
+            created += [row[0] for row in cursor.fetchall()]
+
+
+def follow(user, authors):
+    """Подписывает пользователя на авторов (объекты или pk)."""
+    author_ids = {getattr(author, 'pk', author) for author in authors}
+    author_ids.discard(user.pk)
+    created = _insert(user.pk, sorted(author_ids))
+    if not created:
+        return
+    counters.follows_added(user.pk, created)
+    for author_id in created:
+        timeline.followed(user.pk, author_id)
+    signals.bump_authors(user.pk, *created)
+
+
+def unfollow(user, authors):
+    """Отписывает пользователя от авторов (объекты или pk)."""
+    author_ids = {getattr(author, 'pk', author) for author in authors}
+    Follow.objects.filter(user_id=user.pk, author_id__in=author_ids).delete()
@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 from .models import Post, Comment
+from .uploads import normalize_image, too_many_pixels
 
 
 class PostForm(forms.ModelForm):
@@ -7,6 +9,36 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not getattr(image, 'image', None):
+            # Картинку не загружали или оставили прежнюю
+            return image
+        if too_many_pixels(image.image):
+            raise forms.ValidationError(
+                'Картинка больше %(pixels)s мегапикселей.',
+                params={'pixels': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        try:
+            return normalize_image(image)
+        except (OSError, ValueError):
+            raise forms.ValidationError(
+                self.fields['image'].error_messages['invalid_image'])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        image = self.files.get('image')
+        if image is not None and image.size > settings.POST_IMAGE_MAX_BYTES:
+            # Сверх лимита файл не сохранялся, и ImageField мог счесть
+            # его битым: заменяем ошибку понятной.
+            self.errors.pop('image', None)
+            self.add_error('image', forms.ValidationError(
+                'Файл больше %(megabytes)s МБ.',
+                params={
+                    'megabytes': settings.POST_IMAGE_MAX_BYTES // 2 ** 20},
+            ))
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,117 @@
+"""Области кэша и ключи свежести лент.
+
+Области (scopes) - версии из core.cache, от которых зависит страница.
+Ключ свежести для условных GET-запросов (core.http.conditional) - это
+последний пост или комментарий ленты по индексу (дата, pk) и версии
+её областей: правки и удаления не меняют последнюю дату, но меняют
+версии. Поэтому и дата изменения - самая поздняя из даты последней
+строки и времени смены версий. Ключ стоит одного запроса по индексу
+и чтения кэша.
+"""
+from django.db.models import OuterRef, Subquery
+
+from core.cache import get_versions, version_time
+
+from .models import Comment, Post
+from .timeline import timeline_posts
+
+
+def index_scopes(request):
+    return ['posts', 'groups', 'users']
+
+
+def group_scopes(request, slug):
+    return [f'group:{slug}', 'users']
+
+
+def profile_scopes(request, username):
+    return [f'author:{username}', 'groups']
+
+
+def _post_scopes(pk, username):
+    return [f'post:{pk}', f'author:{username}', 'groups', 'users']
+
+
+def post_scopes(request, pk):
+    username = Post.objects.filter(pk=pk).values_list(
+        'author__username', flat=True).first()
+    return _post_scopes(pk, username)
+
+
+def latest(queryset, field='pub_date'):
+    """(дата, pk) последней строки выборки или None."""
+    return queryset.order_by(f'-{field}', '-pk').values_list(
+        field, 'pk').first()
+
+
+def last_modified(versions, *dates):
+    """Самая поздняя из дат и времени смены версий.
+
+    None, если время смены какой-то версии неизвестно.
+    """
+    times = [version_time(version) for version in versions]
+    if None in times:
+        return None
+    return max(times + [date for date in dates if date])
+
+
+def _freshness(row, scopes):
+    versions = get_versions(scopes)
+    return (row, versions), last_modified(versions, row and row[0])
+
+
+def index_freshness(request):
+    return _freshness(latest(Post.objects.all()), index_scopes(request))
+
+
+def group_freshness(request, slug):
+    return _freshness(
+        latest(Post.objects.filter(group__slug=slug)),
+        group_scopes(request, slug),
+    )
+
+
+def profile_freshness(request, username):
+    return _freshness(
+        latest(Post.objects.filter(author__username=username)),
+        profile_scopes(request, username),
+    )
+
+
+def post_freshness(request, pk):
+    """Пост, его автор и последний комментарий - одним запросом."""
+    last_comment = Comment.objects.filter(post=OuterRef('pk')).order_by(
+        '-created', '-pk').values_list('created', 'pk')
+    row = Post.objects.filter(pk=pk).annotate(
+        comment_created=Subquery(last_comment.values('created')[:1]),
+        comment_pk=Subquery(last_comment.values('pk')[:1]),
+    ).values_list(
+        'author__username', 'pub_date', 'comment_created', 'comment_pk'
+    ).first()
+    if row is None:
+        return None, None
+    username, pub_date, comment_created, comment_pk = row
+    versions = get_versions(_post_scopes(pk, username))
+    key = ((pub_date, comment_created, comment_pk), versions)
+    return key, last_modified(versions, pub_date, comment_created)
+
+
+def for_viewer(freshness):
+    """Ключ свежести страницы, которая выглядит по-разному для читателей.
+
+    Даты изменения нет: по If-Modified-Since браузер получил бы 304 и
+    после входа на сайт или выхода из него.
+    """
+    def wrapper(request, *args, **kwargs):
+        key, _ = freshness(request, *args, **kwargs)
+        return (key, request.user.pk), None
+    return wrapper
+
+
+def follow_freshness(request):
+    """Только для вошедших: анонимам вид отвечает 403 до проверки."""
+    user = request.user
+    return _freshness(
+        timeline_posts(user).latest(),
+        ['posts', f'author:{user.username}'],
+    )
@@ -0,0 +1,108 @@
+import json
+import multiprocessing
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.cache import bump_version
+
+MODES = ('local', 'shared', 'tiered')
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def measure(mode, requests, pages, write_every, seed):
+    """Запросы к главной; возвращает (попаданий, задержки в мс).
+
+    Попадание - страница, отданная кэшем страниц (versioned_cache_page).
+    SQL-запросы тут не показатель: проверка свежести для условных
+    запросов (core.http.conditional) делает запрос и при попадании.
+    """
+    rng = random.Random(seed)
+    # Адрес не из INTERNAL_IPS, чтобы не мерить debug toolbar
+    client = Client(REMOTE_ADDR='192.0.2.1')
+    url = reverse('posts:index')
+    hits = 0
+    timings = []
+    with override_settings(CACHES={**settings.CACHES,
+                                   'default': settings.CACHES[mode]}):
+        for number in range(1, requests + 1):
+            if write_every and number % write_every == 0:
+                bump_version('posts')
+            start = time.perf_counter()
+            response = client.get(url, {'page': rng.randint(1, pages)})
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += getattr(response, 'from_page_cache', False)
+    return hits, timings
+
+
+def run_worker(task):
+    """measure() в отдельном процессе."""
+    try:
+        return measure(*task)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Нагружает главную страницу из нескольких процессов и '
+            'сравнивает долю попаданий в кэш и задержки для режимов кэша.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на один процесс.')
+        parser.add_argument('--pages', type=int, default=5,
+                            help='Из скольких страниц выбирать случайно.')
+        parser.add_argument('--write-every', type=int, default=0,
+                            help='Сбрасывать версию ленты каждые N '
+                                 'запросов процесса.')
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Нужна платформа с fork().')
+        context = multiprocessing.get_context('fork')
+        results = {}
+        for mode in options['modes']:
+            caches['shared'].clear()
+            caches[mode].clear()
+            # Дочерние процессы не должны делить соединение с базой
+            connections.close_all()
+            tasks = [
+                (mode, options['requests'], options['pages'],
+                 options['write_every'], seed)
+                for seed in range(options['workers'])
+            ]
+            start = time.perf_counter()
+            with context.Pool(options['workers']) as pool:
+                outcome = pool.map(run_worker, tasks)
+            elapsed = time.perf_counter() - start
+            hits = sum(worker_hits for worker_hits, _ in outcome)
+            timings = [ms for _, worker in outcome for ms in worker]
+            results[mode] = {
+                'hit_rate': hits / len(timings),
+                'p50_ms': percentile(timings, 0.5),
+                'p99_ms': percentile(timings, 0.99),
+                'rps': len(timings) / elapsed,
+            }
+            self.stdout.write(
+                f'{mode}: попаданий {results[mode]["hit_rate"]:.1%}, '
+                f'p50 {results[mode]["p50_ms"]:.2f} мс, '
+                f'p99 {results[mode]["p99_ms"]:.2f} мс, '
+                f'{results[mode]["rps"]:.0f} запросов/с'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,82 @@
+import copy
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.warmup import warm_templates
+from posts.models import Post
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+DUMMY_CACHE = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+
+def templates_setting(cached):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    engine = templates[0]
+    engine['APP_DIRS'] = False
+    engine['OPTIONS']['loaders'] = (
+        [('django.template.loaders.cached.Loader', LOADERS)] if cached
+        else LOADERS
+    )
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время ответа страниц с разбором шаблонов на каждый '
+            'запрос и с cached.Loader после прогрева. Кэш страниц на время '
+            'замера отключён, чтобы страницы каждый раз отрисовывались.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на страницу в каждом режиме.')
+
+    def urls(self):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False).first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост в группе.')
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': post.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': post.author.username}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'pk': post.pk}),
+        }
+
+    def measure(self, client, url, requests):
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        urls = self.urls()
+        # Адрес не из INTERNAL_IPS, чтобы не мерить debug toolbar
+        client = Client(REMOTE_ADDR='192.0.2.1')
+        results = {}
+        for cached in (False, True):
+            with override_settings(
+                    TEMPLATES=templates_setting(cached),
+                    CACHES={**settings.CACHES, 'default': DUMMY_CACHE}):
+                if cached:
+                    warm_templates()
+                for view, url in urls.items():
+                    results[view, cached] = self.measure(
+                        client, url, options['requests'])
+        for view in urls:
+            before, after = results[view, False], results[view, True]
+            self.stdout.write(
+                f'{view}: без кэша шаблонов {before:.2f} мс, '
+                f'с кэшем {after:.2f} мс ({1 - after / before:.0%} быстрее)'
+            )
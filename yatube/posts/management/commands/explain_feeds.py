@@ -0,0 +1,128 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.models import Comment, Follow, Group, Post
+from posts.timeline import timeline_posts
+from posts.views import POSTS_PER_PAGE
+
+User = get_user_model()
+RUNS = 5
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Печатает планы и время запросов каждой ленты из posts/views.py '
+            'с индексами моделей posts и, с --compare, без них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=100,
+                            help='Номер страницы для замера OFFSET.')
+        parser.add_argument('--compare', action='store_true',
+                            help='Повторить замер без индексов '
+                                 '(в откатываемой транзакции).')
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+
+    def view_queries(self, page):
+        post = Post.objects.order_by('-comments_count').first()
+        if post is None:
+            raise CommandError('Нет постов: запустите seed_feeds.')
+        group = Group.objects.order_by('-posts_count').first()
+        author = User.objects.order_by('-profile__posts_count').first()
+        reader = User.objects.order_by('-profile__following_count').first()
+        offset = (page - 1) * POSTS_PER_PAGE
+        # Записи ленты подписок; посты знаменитостей читаются так же,
+        # как лента профиля
+        timeline = timeline_posts(reader).querysets()[0]
+
+        def page_of(queryset):
+            return queryset[offset:offset + POSTS_PER_PAGE]
+
+        return {
+            'index': page_of(Post.objects.feed()),
+            'index (count)': Post.objects.all(),
+            'group_post': page_of(Post.objects.feed().filter(group=group)),
+            'group_post (count)': Post.objects.filter(group=group),
+            'profile': page_of(author.posts.feed()),
+            'profile (following)': Follow.objects.filter(
+                user=reader, author=author),
+            'post_detail (comments)': Comment.objects.filter(
+                post=post).select_related('author'),
+            'follow_index': page_of(timeline),
+            'follow_index (count)': timeline,
+        }
+
+    def explain(self, queryset, label):
+        # Метка делает текст запроса уникальным: иначе sqlite3 может
+        # взять подготовленный план из своего кэша, составленный до
+        # удаления индексов.
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql} /* {label} */', params)
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+    def measure(self, queries, label):
+        result = {}
+        for name, queryset in queries.items():
+            if name.endswith('(count)'):
+                queryset = queryset.order_by()
+                plan = self.explain(queryset.values('pk'), label)
+
+                def run(queryset=queryset):
+                    return queryset.count()
+            else:
+                plan = self.explain(queryset, label)
+
+                def run(queryset=queryset):
+                    return len(queryset._clone())
+            timings = []
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            result[name] = {'plan': plan, 'ms': sorted(timings)[RUNS // 2]}
+        return result
+
+    def drop_indexes(self):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow):
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, editor)))
+
+    def report(self, title, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, item in result.items():
+            self.stdout.write(f'{name}: {item["ms"]:.2f} мс')
+            self.stdout.write(f'    {item["plan"]}'.replace('\n', '\n    '))
+
+    def handle(self, *args, **options):
+        queries = self.view_queries(options['page'])
+        results = {'after': self.measure(queries, 'after')}
+        if options['compare']:
+            if not connection.features.can_rollback_ddl:
+                raise CommandError(
+                    'База не умеет откатывать DDL, сравнение невозможно.')
+            try:
+                with transaction.atomic():
+                    self.drop_indexes()
+                    results['before'] = self.measure(
+                        self.view_queries(options['page']), 'before')
+                    raise Rollback
+            except Rollback:
+                pass
+            self.report('Без индексов', results['before'])
+        self.report('С индексами', results['after'])
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
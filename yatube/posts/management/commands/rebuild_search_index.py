@@ -0,0 +1,97 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from posts import search
+from posts.models import Comment, Post, SearchIndexCheckpoint
+
+CHECKPOINT = 'posts'
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает индекс поиска по постам и комментариям, '
+            'читая посты пачками по (pub_date, id). Новый индекс строится '
+            'в теневых таблицах и подменяет рабочий в конце, так что поиск '
+            'всё это время работает. После каждой пачки сохраняется '
+            'отметка: последний пост и последний id комментария. '
+            'С --incremental индексируются только посты и комментарии '
+            'после отметки: так продолжается прерванная перестройка и '
+            'подхватываются строки, добавленные в обход сигналов '
+            '(bulk_create, импорт), в том числе комментарии к старым '
+            'постам. Правки в обход сигналов (QuerySet.update) отметка не '
+            'замечает - для них нужна полная перестройка.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Не перестраивать индекс, начать с отметки.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        backend = search.backend()
+        size = options['batch_size']
+        with transaction.atomic():
+            checkpoint, _ = SearchIndexCheckpoint.objects.get_or_create(
+                name=CHECKPOINT)
+            if not options['incremental']:
+                backend.start_rebuild()
+                checkpoint.pub_date = checkpoint.post_pk = None
+                # Более ранние комментарии проиндексируются с их постами
+                checkpoint.comment_pk = Comment.objects.aggregate(
+                    last=Max('pk'))['last']
+                checkpoint.save()
+        # Прерванная перестройка продолжается в теневые таблицы
+        rebuilding = backend.rebuilding()
+        target = backend.building() if rebuilding else backend
+        self.index_posts(target, checkpoint, size)
+        self.index_comments(target, checkpoint, size)
+        if rebuilding:
+            backend.finish_rebuild()
+            self.stdout.write('Новый индекс подключён')
+        self.stdout.write(f'Готово, отметка: {checkpoint}')
+
+    def index_posts(self, backend, checkpoint, size):
+        posts = Post.objects.order_by('pub_date', 'pk')
+        if checkpoint.post_pk is not None:
+            posts = posts.filter(
+                Q(pub_date__gt=checkpoint.pub_date)
+                | Q(pub_date=checkpoint.pub_date, pk__gt=checkpoint.post_pk)
+            )
+        total = posts.count()
+        rows = posts.values_list('pk', 'pub_date', 'text').iterator(
+            chunk_size=size)
+        done = 0
+        while True:
+            batch = list(islice(rows, size))
+            if not batch:
+                break
+            with transaction.atomic():
+                backend.write((pk, text) for pk, _, text in batch)
+                backend.write_comments(Comment.objects.filter(
+                    post_id__in=[pk for pk, _, _ in batch]
+                ).values_list('pk', 'text', 'post_id'))
+                checkpoint.post_pk, checkpoint.pub_date, _ = batch[-1]
+                checkpoint.save()
+            done += len(batch)
+            self.stdout.write(f'Проиндексировано {done} из {total}')
+
+    def index_comments(self, backend, checkpoint, size):
+        comments = Comment.objects.order_by('pk')
+        if checkpoint.comment_pk is not None:
+            comments = comments.filter(pk__gt=checkpoint.comment_pk)
+        total = comments.count()
+        rows = comments.values_list('pk', 'text', 'post_id').iterator(
+            chunk_size=size)
+        done = 0
+        while True:
+            batch = list(islice(rows, size))
+            if not batch:
+                break
+            with transaction.atomic():
+                backend.write_comments(batch)
+                checkpoint.comment_pk = batch[-1][0]
+                checkpoint.save()
+            done += len(batch)
+            self.stdout.write(
+                f'Комментарии: проиндексировано {done} из {total}')
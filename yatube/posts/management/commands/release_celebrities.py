@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Раскладывает по лентам подписок посты знаменитостей, у '
+            'которых подписчиков стало меньше '
+            'TIMELINE_CELEBRITY_RELEASE_THRESHOLD. Обычно это делает '
+            'фоновый поток после отписки; команда доделывает то, что '
+            'не успело выполниться до перезапуска.')
+
+    def handle(self, *args, **options):
+        for author_id in list(timeline.pending_releases().values_list(
+                'user_id', flat=True)):
+            timeline.release(author_id)
+            self.stdout.write(f'Автор {author_id}: посты разложены')
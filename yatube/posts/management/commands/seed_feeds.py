@@ -0,0 +1,90 @@
+import random
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+PREFIX = 'seed'
+
+
+def batched(objects, size):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу большим объёмом пользователей, постов, '
+            'комментариев и подписок для замеров лент.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на одного пользователя.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def create(self, model, objects, batch_size, **kwargs):
+        for batch in batched(objects, batch_size):
+            model.objects.bulk_create(batch, **kwargs)
+        self.stdout.write(f'{model.__name__}: {model.objects.count()}')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['batch_size']
+        with transaction.atomic():
+            first_user = User.objects.count()
+            self.create(User, (
+                User(username=f'{PREFIX}_{first_user + i}')
+                for i in range(options['users'])
+            ), size)
+            user_ids = list(User.objects.filter(
+                username__startswith=f'{PREFIX}_'
+            ).values_list('pk', flat=True))
+            first_group = Group.objects.count()
+            self.create(Group, (
+                Group(title=f'Группа {first_group + i}',
+                      slug=f'{PREFIX}-{first_group + i}',
+                      description='Группа для замеров')
+                for i in range(options['groups'])
+            ), size)
+            group_ids = list(Group.objects.filter(
+                slug__startswith=f'{PREFIX}-'
+            ).values_list('pk', flat=True)) + [None]
+            self.create(Post, (
+                Post(text=f'Пост {i}', author_id=rng.choice(user_ids),
+                     group_id=rng.choice(group_ids))
+                for i in range(options['posts'])
+            ), size)
+            post_ids = list(Post.objects.values_list('pk', flat=True))
+            self.create(Comment, (
+                Comment(text=f'Комментарий {i}', post_id=rng.choice(post_ids),
+                        author_id=rng.choice(user_ids))
+                for i in range(options['comments'])
+            ), size)
+            follows = min(options['follows'], len(user_ids))
+            self.create(Follow, (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in set(rng.sample(user_ids, follows))
+                if author_id != user_id
+            ), size, ignore_conflicts=True)
+            # bulk_create не посылает сигналов: счётчики и ленты
+            # подписок заполняем отдельно.
+            counters.reconcile()
+            for user_id, author_id in Follow.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', 'author_id').iterator():
+                timeline.backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS('Готово'))
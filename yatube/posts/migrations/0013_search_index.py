@@ -0,0 +1,36 @@
+from django.db import migrations
+
+CREATE = (
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, tokenize = 'unicode61')",
+    # Совпадение в тексте поста весит вдвое больше, чем в комментариях
+    "INSERT INTO posts_search(posts_search, rank) "
+    "VALUES ('rank', 'bm25(2.0, 1.0)')",
+    "INSERT INTO posts_search(rowid, text, comments) "
+    "SELECT post.id, post.text, coalesce(("
+    "SELECT group_concat(comment.text, char(10)) "
+    "FROM posts_comment AS comment WHERE comment.post_id = post.id"
+    "), '') FROM posts_post AS post",
+)
+DROP = ('DROP TABLE posts_search',)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Таблица нужна только search.SqliteBackend
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_content_hash_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Индекс')),
+                ('pub_date', models.DateTimeField(null=True, verbose_name='Дата публикации поста')),
+                ('post_pk', models.PositiveIntegerField(null=True, verbose_name='id поста')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Отметка индекса поиска',
+                'verbose_name_plural': 'Отметки индекса поиска',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Комментарии - отдельные строки индекса, а не одна колонка поста
+CREATE = (
+    'DROP TABLE posts_search',
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, tokenize = 'unicode61')",
+    "CREATE VIRTUAL TABLE posts_comment_search USING fts5("
+    "text, post_id UNINDEXED, tokenize = 'unicode61')",
+    'INSERT INTO posts_search(rowid, text) SELECT id, text FROM posts_post',
+    'INSERT INTO posts_comment_search(rowid, text, post_id) '
+    'SELECT id, text, post_id FROM posts_comment',
+)
+DROP = (
+    'DROP TABLE posts_comment_search',
+    'DROP TABLE posts_search',
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, tokenize = 'unicode61')",
+    "INSERT INTO posts_search(posts_search, rank) "
+    "VALUES ('rank', 'bm25(2.0, 1.0)')",
+    "INSERT INTO posts_search(rowid, text, comments) "
+    "SELECT post.id, post.text, coalesce(("
+    "SELECT group_concat(comment.text, char(10)) "
+    "FROM posts_comment AS comment WHERE comment.post_id = post.id"
+    "), '') FROM posts_post AS post",
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Таблицы нужны только search.SqliteBackend
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_search_index_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
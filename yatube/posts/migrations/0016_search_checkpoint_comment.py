@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_search_comment_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchindexcheckpoint',
+            name='comment_pk',
+            field=models.PositiveIntegerField(null=True, verbose_name='id комментария'),
+        ),
+    ]
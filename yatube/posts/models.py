@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentHashStorage
+
 User = get_user_model()
 
 
@@ -8,11 +10,21 @@ class Group(models.Model):
     title = models.CharField('Название группы', max_length=200)
     slug = models.SlugField('Адрес группы', unique=True)
     description = models.TextField('Описание группы')
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты вместе с автором и группой и числом постов автора."""
+        return self.select_related('author', 'group').annotate(
+            author_posts_count=models.F('author__profile__posts_count')
+        )
+
+
 class Post(models.Model):
     text = models.TextField('Пост', help_text='Текст нового поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
@@ -34,18 +46,50 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentHashStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста для srcset."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост',
+    )
+    source = models.CharField('Исходная картинка', max_length=100)
+    image = models.FileField('Картинка', upload_to='posts/')
+    format = models.CharField('Формат', max_length=10)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        ordering = ['format', 'width']
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+
+
 class Comment(models.Model):
     text = models.TextField('Комментарий:', help_text='Текст комментария')
     created = models.DateTimeField('Дата', auto_now_add=True)
@@ -66,6 +110,10 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -83,5 +131,63 @@ class Follow(models.Model):
     )
 
     class Meta:
-        constraints = models.UniqueConstraint(fields=['user', 'author'],
-                                              name='unique_following')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_following'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class SearchIndexCheckpoint(models.Model):
+    """Докуда rebuild_search_index проиндексировал посты и комментарии."""
+    name = models.CharField('Индекс', max_length=50, unique=True)
+    pub_date = models.DateTimeField('Дата публикации поста', null=True)
+    post_pk = models.PositiveIntegerField('id поста', null=True)
+    comment_pk = models.PositiveIntegerField('id комментария', null=True)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка индекса поиска'
+        verbose_name_plural = 'Отметки индекса поиска'
+
+    def __str__(self):
+        return (f'{self.name}: {self.pub_date}, {self.post_pk}, '
+                f'{self.comment_pk}')
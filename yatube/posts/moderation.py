@@ -0,0 +1,165 @@
+"""Массовые действия модераторов над постами и комментариями.
+
+Строки обрабатываются пачками по MODERATION_BATCH_SIZE id: на пачку
+один UPDATE или DELETE без загрузки объектов и без сигналов на каждый
+объект. Счётчики, ленты подписок, индекс поиска и версии кэша
+исправляются сразу для всей пачки, а файлы миниатюр удалённых постов
+удаляются в фоне. Каждая пачка - своя транзакция,
+поэтому ни память, ни время блокировки не растут с размером выборки.
+
+Функции возвращают число изменённых или удалённых строк.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from core.cache import bump_version
+
+from . import counters, search, thumbnails, timeline
+from .models import Comment, Post, PostImageVariant, TimelineEntry
+from .signals import bump_authors, bump_groups
+
+# Что ссылается на пост и удаляется вместе с ним
+POST_DEPENDENTS = (Comment, TimelineEntry, PostImageVariant)
+
+
+def batches(queryset):
+    """id строк выборки пачками по возрастанию.
+
+    Следующая пачка выбирается по условию pk > последнего id, поэтому
+    строки можно менять и удалять, не сбиваясь.
+    """
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        if last is not None:
+            ids = ids.filter(pk__gt=last)
+        batch = list(ids[:settings.MODERATION_BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def _counts(queryset, field):
+    return dict(queryset.order_by().values_list(field).annotate(
+        count=Count('pk')))
+
+
+def _negative(counts):
+    return {key: -count for key, count in counts.items()}
+
+
+def _raw_delete(queryset):
+    # Без сборки каскада и сигналов: зависимые строки уже удалены,
+    # а счётчики и кэш поправит вызывающий.
+    return queryset._raw_delete(queryset.db)
+
+
+def move_posts(posts, group):
+    """Переносит посты в группу (или убирает из групп при group=None)."""
+    moved = 0
+    for ids in batches(posts):
+        with transaction.atomic():
+            batch = Post.objects.filter(pk__in=ids).exclude(group=group)
+            old_groups = _counts(batch, 'group')
+            author_ids = list(_counts(batch, 'author'))
+            count = batch.update(group=group)
+            if group is not None:
+                old_groups.setdefault(group.pk, 0)
+            groups = _negative(old_groups)
+            if group is not None:
+                groups[group.pk] += count
+            counters.posts_added(groups=groups)
+        moved += count
+        bump_version(*(f'post:{pk}' for pk in ids))
+        bump_authors(*author_ids)
+        bump_groups(*groups)
+    bump_version('posts')
+    return moved
+
+
+def reassign_posts(posts, author):
+    """Передаёт посты другому автору."""
+    reassigned = 0
+    for ids in batches(posts):
+        with transaction.atomic():
+            batch = Post.objects.filter(pk__in=ids).exclude(author=author)
+            authors = _negative(_counts(batch, 'author'))
+            moved_ids = list(batch.values_list('pk', flat=True))
+            count = batch.update(author=author)
+            authors[author.pk] = authors.get(author.pk, 0) + count
+            counters.posts_added(authors=authors)
+            timeline.reassigned(moved_ids, author.pk)
+        reassigned += count
+        bump_version(*(f'post:{pk}' for pk in ids))
+        bump_authors(*authors)
+    bump_version('posts')
+    return reassigned
+
+
+def delete_comments(comments):
+    """Удаляет комментарии."""
+    deleted = 0
+    for ids in batches(comments):
+        with transaction.atomic():
+            batch = Comment.objects.filter(pk__in=ids)
+            posts = _negative(_counts(batch, 'post'))
+            deleted += _raw_delete(batch)
+            counters.comments_added(posts)
+            search.remove_comments(*ids)
+        bump_version(*(f'post:{pk}' for pk in posts))
+    return deleted
+
+
+def delete_posts(posts):
+    """Удаляет посты вместе с комментариями к ним и записями лент."""
+    deleted = 0
+    for ids in batches(posts):
+        with transaction.atomic():
+            batch = Post.objects.filter(pk__in=ids)
+            authors = _negative(_counts(batch, 'author'))
+            groups = _negative(_counts(batch, 'group'))
+            search.remove_comments(*Comment.objects.filter(
+                post_id__in=ids).values_list('pk', flat=True))
+            thumbnails.schedule_removal(
+                list(batch.exclude(image='').values_list('image', flat=True)),
+                list(PostImageVariant.objects.filter(
+                    post_id__in=ids).values_list('image', flat=True)),
+            )
+            for model in POST_DEPENDENTS:
+                _raw_delete(model.objects.filter(post_id__in=ids))
+            deleted += _raw_delete(batch)
+            counters.posts_added(authors, groups)
+            search.remove_posts(*ids)
+        bump_version(*(f'post:{pk}' for pk in ids))
+        bump_authors(*authors)
+        bump_groups(*groups)
+    bump_version('posts')
+    return deleted
+
+
+def user_content_counts(user_ids):
+    """Сколько постов и комментариев у пользователей.
+
+    Возвращает {id пользователя: (постов, комментариев)} - то, что
+    удалит delete_user_content.
+    """
+    posts = _counts(Post.objects.filter(author_id__in=user_ids), 'author')
+    comments = _counts(
+        Comment.objects.filter(author_id__in=user_ids), 'author')
+    return {
+        user_id: (posts.get(user_id, 0), comments.get(user_id, 0))
+        for user_id in user_ids
+    }
+
+
+def delete_user_content(user_ids):
+    """Удаляет все посты и комментарии пользователей.
+
+    Возвращает пару (удалено комментариев, удалено постов).
+    """
+    comments = delete_comments(Comment.objects.filter(
+        author_id__in=user_ids))
+    posts = delete_posts(Post.objects.filter(author_id__in=user_ids))
+    return comments, posts
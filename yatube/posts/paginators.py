@@ -0,0 +1,188 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+# С какого числа строк считать по статистике базы, а не COUNT(*)
+ESTIMATE_THRESHOLD = 10000
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, post):
+    """Упаковывает направление и ключ (pub_date, pk) в непрозрачную строку."""
+    raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        raise InvalidCursor(cursor)
+    return direction, pub_date, pk
+
+
+def keyset(queryset, direction=None, pub_date=None, pk=None, pk_field='pk'):
+    """Упорядочивает выборку по ключу (pub_date, pk) и режет по курсору.
+
+    Для PREVIOUS порядок прямой, иначе обратный. Условие на pub_date
+    отдельно от OR даёт базе диапазон по индексу с датой.
+    """
+    if direction == PREVIOUS:
+        return queryset.filter(pub_date__gte=pub_date).filter(
+            Q(pub_date__gt=pub_date)
+            | Q(pub_date=pub_date, **{f'{pk_field}__gt': pk})
+        ).order_by('pub_date', pk_field)
+    queryset = queryset.order_by('-pub_date', f'-{pk_field}')
+    if direction == NEXT:
+        queryset = queryset.filter(pub_date__lte=pub_date).filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, **{f'{pk_field}__lt': pk})
+        )
+    return queryset
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (pub_date, pk) без COUNT и OFFSET.
+
+    Каждая страница - это один запрос с условием по ключу и LIMIT,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+    cursor_based = True
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def get_page(self, cursor):
+        """Возвращает страницу, на неверный курсор - первую страницу."""
+        if cursor:
+            try:
+                return self.page(*decode_cursor(cursor))
+            except InvalidCursor:
+                pass
+        return self.page()
+
+    def page(self, direction=None, pub_date=None, pk=None):
+        # Выборка, которую нельзя отфильтровать как QuerySet (например,
+        # posts.timeline.Timeline), режет себя по курсору сама.
+        if hasattr(self.object_list, 'keyset'):
+            queryset = self.object_list.keyset(direction, pub_date, pk)
+        else:
+            queryset = keyset(self.object_list, direction, pub_date, pk)
+        limit = self.per_page + 1
+        object_list = list(queryset[:limit])
+        if direction == PREVIOUS:
+            if not object_list:
+                return self.page()
+            has_previous = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_next = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page]
+            has_previous = direction == NEXT
+        return CursorPage(object_list, self, has_next, has_previous)
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return encode_cursor(NEXT, self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return encode_cursor(PREVIOUS, self.object_list[0])
+        return None
+
+
+def estimate_count(model, using):
+    """Оценка числа строк таблицы из статистики базы или None.
+
+    На SQLite статистика появляется после ANALYZE, на PostgreSQL
+    её обновляет autovacuum.
+    """
+    table = model._meta.db_table
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [table],
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor != 'sqlite':
+            return None
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute(
+            'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+        # Первое число в stat - строк в таблице или индексе
+        counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+        return max(counts) if counts else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает большие таблицы целиком.
+
+    Для запроса без условий число строк берётся из статистики базы,
+    если она есть и строк не меньше ESTIMATE_THRESHOLD. Число
+    страниц тогда приблизительное.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
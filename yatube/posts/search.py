@@ -0,0 +1,300 @@
+"""Полнотекстовый поиск по постам и комментариям к ним.
+
+Поиск идёт по обратному индексу, а не по LIKE '%слово%' с полным
+просмотром таблицы. На SQLite индекс - две виртуальные таблицы FTS5:
+posts_search (rowid = id поста, текст поста) и posts_comment_search
+(rowid = id комментария, текст и id поста). Запись поста или
+комментария меняет только его строку, сколько бы комментариев ни было
+у поста.
+
+Пост найден, если каждое слово запроса есть в его тексте или в
+каком-нибудь комментарии к нему. Совпадение в тексте поста весит
+вдвое больше, чем в комментарии.
+
+Индекс обновляют сигналы при сохранении и удалении постов и
+комментариев. Команда rebuild_search_index строит индекс заново в
+теневых таблицах (с суффиксом SHADOW) и подменяет ими рабочие, так что
+поиск во время перестройки работает по старому индексу. Пока теневые
+таблицы есть, сигналы пишут и в них.
+
+Бэкенд задаётся настройкой SEARCH_BACKEND; для баз без FTS5 есть
+SimpleBackend, который ищет обычными запросами.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+
+TABLE = 'posts_search'
+COMMENTS_TABLE = 'posts_comment_search'
+# Колонки таблиц FTS5, как в миграции 0015_search_comment_rows
+COLUMNS = {
+    TABLE: "text, tokenize = 'unicode61'",
+    COMMENTS_TABLE: "text, post_id UNINDEXED, tokenize = 'unicode61'",
+}
+SHADOW = '_new'
+# Во сколько раз совпадение в тексте поста важнее, чем в комментарии
+POST_WEIGHT = 2
+# Ищем по словам запроса; знаки FTS5 (кавычки, *, NEAR) не пропускаем
+TERM = re.compile(r'\w+')
+MAX_TERMS = 10
+# Строк в одном INSERT: параметров выходит меньше предела SQLite (999)
+INSERT_BATCH_SIZE = 300
+
+
+def terms(query):
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности.
+
+    sql выбирает post_id и score (чем меньше, тем лучше). Отдаёт число
+    результатов и срезы, поэтому подходит для Paginator: база
+    возвращает только id постов страницы.
+    """
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+
+    @cached_property
+    def total(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM ({self.sql})', self.params)
+            return cursor.fetchone()[0]
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.total if index.stop is None else index.stop
+        if stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{self.sql} ORDER BY score, post_id DESC LIMIT %s OFFSET %s',
+                self.params + [stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class SqliteBackend:
+    """Индекс в таблицах FTS5 (см. миграцию 0015_search_comment_rows).
+
+    С shadow=True пишет только в теневые таблицы перестройки.
+    """
+
+    def __init__(self, shadow=False):
+        self.shadow = shadow
+
+    def search(self, query):
+        # Каждое слово ищется в обеих таблицах; пост подходит, если
+        # нашлись все слова. bm25 отрицателен: меньше - лучше.
+        parts, params = [], []
+        words = terms(query)
+        for number, word in enumerate(words):
+            parts += [
+                f'SELECT {number} AS term, rowid AS post_id, '
+                f'rank * {POST_WEIGHT} AS rank '
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s',
+                f'SELECT {number}, post_id, rank '
+                f'FROM {COMMENTS_TABLE} WHERE {COMMENTS_TABLE} MATCH %s',
+            ]
+            params += [f'"{word}"'] * 2
+        return SearchResults(
+            f'SELECT post_id, sum(rank) AS score '
+            f'FROM ({" UNION ALL ".join(parts)}) GROUP BY post_id '
+            f'HAVING count(DISTINCT term) = {len(words)}',
+            params,
+        )
+
+    def index(self, post_ids):
+        rows = list(Post.objects.filter(
+            pk__in=post_ids).values_list('pk', 'text'))
+        # Удалённых постов в rows нет - их строки убираем отдельно
+        self.remove(set(post_ids) - {pk for pk, _ in rows})
+        self.write(rows)
+
+    def write(self, rows):
+        """Заменяет в индексе строки (id поста, текст)."""
+        self._write(TABLE, ('text',), rows)
+
+    def remove(self, post_ids):
+        self._remove(TABLE, post_ids)
+
+    def index_comments(self, comment_ids):
+        rows = list(Comment.objects.filter(
+            pk__in=comment_ids).values_list('pk', 'text', 'post_id'))
+        self.remove_comments(set(comment_ids) - {pk for pk, _, _ in rows})
+        self.write_comments(rows)
+
+    def write_comments(self, rows):
+        """Заменяет в индексе строки (id комментария, текст, id поста)."""
+        self._write(COMMENTS_TABLE, ('text', 'post_id'), rows)
+
+    def remove_comments(self, comment_ids):
+        self._remove(COMMENTS_TABLE, comment_ids)
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            for table in COLUMNS:
+                cursor.execute(f'DELETE FROM {table}')
+
+    def rebuilding(self):
+        """Есть ли теневые таблицы начатой перестройки."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM sqlite_master WHERE name = %s',
+                [TABLE + SHADOW],
+            )
+            return cursor.fetchone() is not None
+
+    def start_rebuild(self):
+        """Создаёт пустые теневые таблицы, отбрасывая прежние."""
+        with connection.cursor() as cursor:
+            for table, columns in COLUMNS.items():
+                cursor.execute(f'DROP TABLE IF EXISTS {table}{SHADOW}')
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE {table}{SHADOW} '
+                    f'USING fts5({columns})')
+
+    def building(self):
+        return SqliteBackend(shadow=True)
+
+    def finish_rebuild(self):
+        """Подменяет рабочие таблицы теневыми одной транзакцией."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table in COLUMNS:
+                cursor.execute(f'DROP TABLE {table}')
+                cursor.execute(
+                    f'ALTER TABLE {table}{SHADOW} RENAME TO {table}')
+
+    def tables(self, table):
+        if self.shadow:
+            return [table + SHADOW]
+        if self.rebuilding():
+            return [table, table + SHADOW]
+        return [table]
+
+    def _write(self, table, columns, rows):
+        rows = list(rows)
+        self._remove(table, [row[0] for row in rows])
+        columns = ('rowid',) + columns
+        row = f'({placeholders(columns)})'
+        # Один INSERT на пачку строк, а не executemany: его параметры
+        # debug toolbar форматирует как одну строку и падает
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            batch = rows[start:start + INSERT_BATCH_SIZE]
+            params = [value for values in batch for value in values]
+            with connection.cursor() as cursor:
+                for name in self.tables(table):
+                    cursor.execute(
+                        f'INSERT INTO {name}({", ".join(columns)}) '
+                        f'VALUES {", ".join([row] * len(batch))}',
+                        params,
+                    )
+
+    def _remove(self, table, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            for name in self.tables(table):
+                cursor.execute(
+                    f'DELETE FROM {name} '
+                    f'WHERE rowid IN ({placeholders(ids)})',
+                    ids,
+                )
+
+
+class SimpleBackend:
+    """Поиск без индекса - для баз, где нет FTS5.
+
+    Годится для разработки: на больших таблицах каждый запрос
+    просматривает их целиком.
+    """
+
+    def search(self, query):
+        posts = Post.objects.feed()
+        for term in terms(query):
+            posts = posts.filter(
+                Q(text__icontains=term) | Q(comments__text__icontains=term))
+        return posts.distinct()
+
+    def index(self, post_ids):
+        pass
+
+    def write(self, rows):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def index_comments(self, comment_ids):
+        pass
+
+    def write_comments(self, rows):
+        pass
+
+    def remove_comments(self, comment_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuilding(self):
+        return False
+
+    def start_rebuild(self):
+        pass
+
+    def building(self):
+        return self
+
+    def finish_rebuild(self):
+        pass
+
+
+def backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search_posts(query):
+    """Посты, в тексте которых или в комментариях есть все слова запроса."""
+    if not terms(query):
+        return Post.objects.none()
+    return backend().search(query)
+
+
+def index_posts(*post_ids):
+    backend().index(post_ids)
+
+
+def remove_posts(*post_ids):
+    backend().remove(post_ids)
+
+
+def index_comments(*comment_ids):
+    backend().index_comments(comment_ids)
+
+
+def remove_comments(*comment_ids):
+    backend().remove_comments(comment_ids)
@@ -0,0 +1,105 @@
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_version
+
+from . import counters, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+def bump_authors(*user_ids):
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True)
+    bump_version(*(f'author:{username}' for username in usernames))
+
+
+def bump_groups(*group_ids):
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True)
+    bump_version(*(f'group:{slug}' for slug in slugs))
+
+
+def bump_post(post, *group_ids):
+    bump_version('posts', f'post:{post.pk}')
+    bump_authors(post.author_id)
+    bump_groups(post.group_id, *group_ids)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    instance._old_group_id, instance._old_image = None, ''
+    if instance.pk is not None:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if old is not None:
+            instance._old_group_id, instance._old_image = old
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.post_created(instance)
+        timeline.fan_out(instance)
+    else:
+        counters.group_changed(instance._old_group_id, instance.group_id)
+    if instance.image and instance.image.name != instance._old_image:
+        thumbnails.schedule(instance.pk)
+    search.index_posts(instance.pk)
+    bump_post(instance, instance._old_group_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_deleted(instance)
+    search.remove_posts(instance.pk)
+    bump_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.comment_created(instance)
+    search.index_comments(instance.pk)
+    bump_version(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_deleted(instance)
+    search.remove_comments(instance.pk)
+    bump_version(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.follow_created(instance)
+        timeline.followed(instance.user_id, instance.author_id)
+    bump_authors(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_deleted(instance)
+    timeline.unfollowed(instance.user_id, instance.author_id)
+    bump_authors(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_version('groups', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Вход на сайт обновляет только last_login - на страницах его нет
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version('users', f'author:{instance.username}')
+
+
+@receiver(request_started)
+def request_started_handler(sender, **kwargs):
+    thumbnails.forget()
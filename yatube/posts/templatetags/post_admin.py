@@ -0,0 +1,145 @@
+"""Иерархия дат в списке постов админки без полного просмотра таблицы.
+
+Стандартный тег date_hierarchy берёт MIN и MAX одним запросом, а годы,
+месяцы и дни - через DISTINCT по усечённой дате. SQLite в обоих
+случаях просматривает весь индекс pub_date (EXPLAIN QUERY PLAN: SCAN
+USING COVERING INDEX post_pub_date_idx). Здесь крайние даты берутся
+двумя запросами с LIMIT 1, а периоды - прыжками по индексу: следующий
+ищется как первая дата не раньше начала следующего периода. Каждый
+запрос - поиск по индексу, и их столько же, сколько ссылок выведено.
+"""
+import datetime
+
+from django import template
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def edge(queryset, field_name, last=False, since=None, until=None):
+    """Первая (или последняя) дата в [since, until) по индексу."""
+    if since is not None:
+        queryset = queryset.filter(**{f'{field_name}__gte': since})
+    if until is not None:
+        queryset = queryset.filter(**{f'{field_name}__lt': until})
+    value = queryset.order_by(
+        f'-{field_name}' if last else field_name
+    ).values_list(field_name, flat=True).first()
+    return value and timezone.localtime(value)
+
+
+def start(day):
+    return timezone.make_aware(
+        datetime.datetime.combine(day, datetime.time()))
+
+
+def truncate(value, kind):
+    if kind == 'year':
+        return datetime.date(value.year, 1, 1)
+    if kind == 'month':
+        return datetime.date(value.year, value.month, 1)
+    return value.date()
+
+
+def following(day, kind):
+    if kind == 'year':
+        return datetime.date(day.year + 1, 1, 1)
+    if kind == 'month':
+        if day.month == 12:
+            return datetime.date(day.year + 1, 1, 1)
+        return datetime.date(day.year, day.month + 1, 1)
+    return day + datetime.timedelta(days=1)
+
+
+def dates(queryset, field_name, kind, since=None, until=None):
+    """Как QuerySet.dates(), но запросом на каждый найденный период."""
+    found = []
+    value = edge(queryset, field_name, since=since, until=until)
+    while value is not None:
+        found.append(truncate(value, kind))
+        value = edge(queryset, field_name, until=until,
+                     since=start(following(found[-1], kind)))
+    return found
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    """Замена date_hierarchy из admin_list с тем же контекстом."""
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+    queryset = cl.queryset
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if not (year_lookup or month_lookup or day_lookup):
+        first = edge(queryset, field_name)
+        last = edge(queryset, field_name, last=True)
+        if first and last and first.year == last.year:
+            year_lookup = first.year
+            if first.month == last.month:
+                month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(
+            int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup,
+                              month_field: month_lookup}),
+                'title': capfirst(
+                    formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{
+                'title': capfirst(
+                    formats.date_format(day, 'MONTH_DAY_FORMAT')),
+            }],
+        }
+    if year_lookup and month_lookup:
+        month = datetime.date(int(year_lookup), int(month_lookup), 1)
+        days = dates(queryset, field_name, 'day', since=start(month),
+                     until=start(following(month, 'month')))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup}),
+                'title': str(year_lookup),
+            },
+            'choices': [{
+                'link': link({year_field: year_lookup,
+                              month_field: month_lookup,
+                              day_field: day.day}),
+                'title': capfirst(
+                    formats.date_format(day, 'MONTH_DAY_FORMAT')),
+            } for day in days],
+        }
+    if year_lookup:
+        year = datetime.date(int(year_lookup), 1, 1)
+        months = dates(queryset, field_name, 'month', since=start(year),
+                       until=start(following(year, 'year')))
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [{
+                'link': link({year_field: year_lookup,
+                              month_field: month.month}),
+                'title': capfirst(
+                    formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+            } for month in months],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{
+            'link': link({year_field: str(year.year)}),
+            'title': str(year.year),
+        } for year in dates(queryset, field_name, 'year')],
+    }
@@ -0,0 +1,32 @@
+from django import template
+
+register = template.Library()
+
+# Карточка занимает всю ширину экрана до брейкпоинта lg и 960px после
+SIZES = '(min-width: 992px) 960px, 100vw'
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{variant.image.url} {variant.width}w' for variant in variants)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """Картинка поста с srcset из заранее построенных вариантов.
+
+    Пока вариантов нет, выводится миниатюра sorl.
+    """
+    by_format = {}
+    if post.image:
+        for variant in post.image_variants.all():
+            if variant.source == post.image.name:
+                by_format.setdefault(variant.format, []).append(variant)
+    jpeg = by_format.get('jpg', [])
+    return {
+        'post': post,
+        'fallback': jpeg[-1] if jpeg else None,
+        'jpeg_srcset': srcset(jpeg),
+        'webp_srcset': srcset(by_format.get('webp', [])),
+        'sizes': SIZES,
+    }
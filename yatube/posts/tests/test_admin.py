@@ -0,0 +1,90 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import paginators
+from posts.models import Group, Post
+from posts.paginators import EstimatedCountPaginator
+
+User = get_user_model()
+CHANGELIST_URL = reverse('admin:posts_post_changelist')
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='-')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CHANGELIST_URL)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        Post.objects.create(text='Пост', author=self.admin, group=self.group)
+        few, _ = self.changelist_queries()
+        for number in range(10):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.admin, group=self.group)
+        many, response = self.changelist_queries()
+        self.assertEqual(few, many)
+        # Группа в строке - поле с поиском, а не список всех групп
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_date_hierarchy_seeks_index(self):
+        for year, month, day in (
+                (2020, 5, 1), (2020, 5, 1), (2020, 12, 31), (2022, 1, 2)):
+            post = Post.objects.create(text='Пост', author=self.admin)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(
+                    datetime.datetime(year, month, day, 23, 30)))
+        for params in ({}, {'pub_date__year': 2020},
+                       {'pub_date__year': 2020, 'pub_date__month': 5}):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(CHANGELIST_URL, params)
+            sql = ' '.join(query['sql'] for query in queries)
+            self.assertNotIn('DISTINCT', sql)
+            self.assertNotIn('MAX(', sql)
+        self.assertContains(response, 'pub_date__day=1&amp;')
+        self.assertNotContains(response, 'pub_date__day=2&amp;')
+        response = self.client.get(CHANGELIST_URL)
+        for year in ('2020', '2022'):
+            self.assertContains(response, f'?pub_date__year={year}"')
+        self.assertNotContains(response, '?pub_date__year=2021"')
+        response = self.client.get(CHANGELIST_URL, {'pub_date__year': 2020})
+        self.assertContains(response, 'pub_date__month=5&amp;')
+        self.assertContains(response, 'pub_date__month=12&amp;')
+        self.assertNotContains(response, 'pub_date__month=6&amp;')
+
+    def test_large_table_count_is_estimated(self):
+        for number in range(3):
+            Post.objects.create(text=f'Пост {number}', author=self.admin)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE posts_post')
+        queryset = Post.objects.all()
+        with mock.patch.object(paginators, 'ESTIMATE_THRESHOLD', 1):
+            paginator = EstimatedCountPaginator(queryset, 10)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(paginator.count, 3)
+            self.assertNotIn('COUNT', ' '.join(
+                query['sql'] for query in queries))
+            # С условием считаем точно
+            filtered = EstimatedCountPaginator(
+                queryset.filter(text='Пост 1'), 10)
+            self.assertEqual(filtered.count, 1)
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 3)
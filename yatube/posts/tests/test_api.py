@@ -0,0 +1,108 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+INDEX_URL = reverse('posts:api_index')
+FOLLOW_URL = reverse('posts:api_follow_index')
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group)
+        self.urls = (
+            INDEX_URL,
+            reverse('posts:api_group_list', kwargs={'slug': 'group'}),
+            reverse('posts:api_profile', kwargs={'username': 'author'}),
+            reverse('posts:api_post_detail', kwargs={'pk': self.post.pk}),
+        )
+
+    def test_feeds_mirror_pages(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                post = data['results'][0] if 'results' in data else data
+                self.assertEqual(post['id'], self.post.pk)
+                self.assertEqual(post['author'], 'author')
+                self.assertEqual(post['group'], 'group')
+
+    def test_unchanged_feed_is_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                self.assertTrue(response.has_header('Last-Modified'))
+                # Один запрос по индексу, без ленты и без тела ответа
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+    def test_changes_update_etag(self):
+        changes = (
+            lambda: Post.objects.create(text='Новый', author=self.author,
+                                        group=self.group),
+            lambda: Comment.objects.create(post=self.post, author=self.author,
+                                           text='Комментарий'),
+            lambda: Post.objects.filter(pk=self.post.pk).first().save(),
+        )
+        post_url = self.urls[-1]
+        for change in changes:
+            etag = self.client.get(post_url)['ETag']
+            change()
+            response = self.client.get(post_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(INDEX_URL)['Last-Modified']
+        response = self.client.get(
+            INDEX_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_follows_version_bumps(self):
+        last_modified = self.client.get(INDEX_URL)['Last-Modified']
+        # Правка не меняет дату последнего поста, но меняет версию
+        with mock.patch('time.time', return_value=time.time() + 60):
+            Post.objects.filter(pk=self.post.pk).first().save()
+        response = self.client.get(
+            INDEX_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_follow_feed(self):
+        self.assertEqual(self.client.get(FOLLOW_URL).status_code, 403)
+        etag = self.client.get(FOLLOW_URL).get('ETag')
+        self.assertIsNone(etag)
+        response = self.client.get(FOLLOW_URL, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 403)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        response = self.client.get(FOLLOW_URL)
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [self.post.pk])
+        response = self.client.get(
+            FOLLOW_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -1,7 +1,20 @@
-from django.test import Client, TestCase
-from django.core.cache import cache
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.db import transaction
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.core.cache import cache, caches
 from django.urls import reverse
-from posts.models import Post, Group, User
+from django.utils.cache import patch_vary_headers
+from core import cache as page_cache
+from core.cache_backends import LockingFileBasedCache, TieredCache
+from posts.management.commands.bench_cache import measure
+from posts.models import Comment, Follow, Post, Group, User
 
 USERNAME = 'MyName'
 AUTHOR = 'аuthor'
@@ -10,6 +23,7 @@ SECOND_GROUP_URL = 'test_slug_2'
 TEST_TITLE = 'Тестовая группа'
 TEST_DESCRIPTION = 'Тестовое описание'
 TEST_TEXT = 'Тестовый текст'
+NEW_TEXT = 'Новый текст'
 
 
 class PostsPagesTests(TestCase):
@@ -34,17 +48,308 @@ class PostsPagesTests(TestCase):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
-    def test_cache_index_page(self):
-        # Загружаем страницу
+    def test_cache_post_card(self):
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': GROUP_URL}),
+            reverse('posts:profile', kwargs={'username': AUTHOR}),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                cache.clear()
+                Post.objects.filter(pk=self.post.pk).update(text=TEST_TEXT)
+                self.authorized_client.get(url)
+                # Изменение в обход сигналов: карточка берётся из кэша
+                Post.objects.filter(pk=self.post.pk).update(text=NEW_TEXT)
+                response = self.authorized_client.get(url)
+                self.assertContains(response, TEST_TEXT)
+                self.assertNotContains(response, NEW_TEXT)
+                # Очистка кэша, запрос и сравнение
+                cache.clear()
+                response = self.authorized_client.get(url)
+                self.assertContains(response, NEW_TEXT)
+
+    def test_post_card_is_shared_between_users(self):
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text=NEW_TEXT)
+        response = Client().get(reverse('posts:index'))
+        # Шапка своя для анонима, карточка поста - из общего кэша
+        self.assertNotContains(response, USERNAME)
+        self.assertContains(response, TEST_TEXT)
+
+    def test_saved_post_is_fresh(self):
+        self.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = NEW_TEXT
+        post.save()
         response = self.authorized_client.get(reverse('posts:index'))
-        content = response.content
-        # Удаляем пост
-        posts_count = Post.objects.count()
-        Post.objects.filter(text=TEST_TEXT, pk=posts_count).delete()
-        # Смотрим, изменилась ли страница
+        self.assertContains(response, NEW_TEXT)
+
+    def test_deleted_post_disappears(self):
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).delete()
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(content, response.content)
-        # Очистка кэша, запрос и сравнение
+        self.assertNotContains(response, TEST_TEXT)
+
+
+class VersionedPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(
+            title=TEST_TITLE,
+            slug=GROUP_URL,
+            description=TEST_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=TEST_TEXT,
+            group=cls.group,
+            author=cls.author,
+        )
+
+    def setUp(self):
         cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(content, response.content)
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username=USERNAME)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_pages_are_cached(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': GROUP_URL}),
+            reverse('posts:profile', kwargs={'username': AUTHOR}),
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIsNotNone(response.context)
+                response = self.guest_client.get(url)
+                self.assertIsNone(response.context)
+
+    def test_new_post_is_visible_at_once(self):
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': GROUP_URL}),
+            reverse('posts:profile', kwargs={'username': AUTHOR}),
+        )
+        for url in pages:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text=NEW_TEXT, group=self.group, author=self.author)
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, NEW_TEXT)
+
+    def test_comment_and_follow_refresh_pages(self):
+        post_url = reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        self.guest_client.get(post_url)
+        Comment.objects.create(
+            text='Свежий комментарий', post=self.post, author=self.user)
+        response = self.guest_client.get(post_url)
+        self.assertContains(response, 'Свежий комментарий')
+        profile_url = reverse('posts:profile', kwargs={'username': AUTHOR})
+        response = self.guest_client.get(profile_url)
+        self.assertContains(response, 'Подписчиков: 0')
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.guest_client.get(profile_url)
+        self.assertContains(response, 'Подписчиков: 1')
+
+    def test_pages_with_csrf_token_are_not_cached(self):
+        url = reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
+
+
+class BenchCacheTests(TestCase):
+    def test_repeated_pages_are_counted_as_hits(self):
+        caches['local'].clear()
+        author = User.objects.create_user(username=AUTHOR)
+        Post.objects.create(text=TEST_TEXT, author=author)
+        hits, timings = measure('local', 10, 1, 0, 0)
+        # Первый запрос строит страницу, остальные берут её из кэша
+        self.assertEqual((hits, len(timings)), (9, 10))
+
+
+class CommitBumpTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username=AUTHOR)
+
+    def test_versions_change_again_on_commit(self):
+        client = Client()
+        url = reverse('posts:index')
+        client.get(url)
+        with transaction.atomic():
+            Post.objects.create(text=NEW_TEXT, author=self.author)
+            # Эти версии видит запрос, который читает до фиксации
+            # старые строки и кладёт страницу в кэш
+            seen = page_cache.get_versions(['posts', f'author:{AUTHOR}'])
+            with mock.patch.object(Post.objects, 'feed',
+                                   return_value=Post.objects.none()):
+                self.assertNotContains(client.get(url), NEW_TEXT)
+        self.assertNotEqual(
+            page_cache.get_versions(['posts', f'author:{AUTHOR}']), seen)
+        self.assertContains(client.get(url), NEW_TEXT)
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'render {self.calls}')
+
+        self.view = page_cache.versioned_cache_page(
+            lambda request: ['scope'], 60, 600)(view)
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+        self.lock = page_cache.LOCK_KEY.format(
+            page_cache.page_cache_key(self.request))
+
+    def test_fresh_page_is_served_from_cache(self):
+        self.view(self.request)
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_page_is_served_while_other_request_rebuilds(self):
+        self.view(self.request)
+        page_cache.bump_version('scope')
+        cache.add(self.lock, True)
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        cache.delete(self.lock)
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 2')
+        self.assertFalse(cache.has_key(self.lock))
+
+    def test_page_is_rebuilt_after_soft_timeout(self):
+        self.view(self.request)
+        now = page_cache.time.time() + 61
+        with mock.patch.object(page_cache.time, 'time', return_value=now):
+            response = self.view(self.request)
+        self.assertEqual(response.content, b'render 2')
+
+    def test_bump_writes_new_version_without_incr(self):
+        versions = {page_cache.get_version('scope')}
+        with mock.patch.object(cache, 'incr', side_effect=AssertionError):
+            for _ in range(3):
+                page_cache.bump_version('scope')
+                versions.add(page_cache.get_version('scope'))
+        self.assertEqual(len(versions), 4)
+
+    def test_pages_with_cookies_are_not_cached(self):
+        def with_cookie(request):
+            response = HttpResponse('render')
+            response.set_cookie('theme', 'dark')
+            return response
+
+        def with_vary(request):
+            response = HttpResponse('render')
+            patch_vary_headers(response, ['Cookie'])
+            return response
+
+        for view in (with_cookie, with_vary):
+            with self.subTest(view=view.__name__):
+                cache.clear()
+                view = page_cache.versioned_cache_page(
+                    lambda request: ['scope'], 60)(view)
+                view(self.request)
+                self.assertIsNone(cache.get(
+                    page_cache.page_cache_key(self.request)))
+
+    @mock.patch.object(page_cache, 'WAIT_TIMEOUT', 0.1)
+    def test_missing_page_is_built_after_waiting_for_lock(self):
+        cache.add(self.lock, True)
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.calls, 1)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два процесса с общим кэшем и своими локальными
+        self.first = TieredCache('shared', {})
+        self.second = TieredCache('shared', {})
+
+    def test_values_are_shared_between_processes(self):
+        self.first.set('key', 'value')
+        self.assertEqual(caches['shared'].get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get_many(['key', 'none']),
+                         {'key': 'value'})
+
+    def test_local_copy_lives_until_local_timeout(self):
+        self.first.set('key', 'old')
+        self.second.get('key')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.second.local.clear()
+        self.assertEqual(self.second.get('key'), 'new')
+
+    def test_incr_goes_to_shared_cache(self):
+        self.first.add('version', 1)
+        self.assertFalse(self.second.add('version', 5))
+        self.assertEqual(self.second.incr('version'), 2)
+        self.assertEqual(self.first.incr('version'), 3)
+        with self.assertRaises(ValueError):
+            self.first.incr('missing')
+
+
+class LockingFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Два процесса с одним каталогом кэша
+        self.first = LockingFileBasedCache(directory.name, {})
+        self.second = LockingFileBasedCache(directory.name, {})
+
+    def test_add_is_atomic(self):
+        has_key = LockingFileBasedCache.has_key
+
+        def slow_has_key(cache, *args, **kwargs):
+            found = has_key(cache, *args, **kwargs)
+            # Без блокировки оба add успели бы увидеть пустой ключ
+            time.sleep(0.1)
+            return found
+
+        results = {}
+
+        def add(name, cache):
+            results[name] = cache.add('lock', name)
+
+        threads = [threading.Thread(target=add, args=item) for item in
+                   {'first': self.first, 'second': self.second}.items()]
+        with mock.patch.object(LockingFileBasedCache, 'has_key',
+                               slow_has_key):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertCountEqual(results.values(), [True, False])
+        winner = 'first' if results['first'] else 'second'
+        self.assertEqual(self.second.get('lock'), winner)
+
+    def test_expired_key_can_be_added_again(self):
+        self.assertTrue(self.first.add('lock', 1, timeout=0.01))
+        self.assertFalse(self.second.add('lock', 2))
+        time.sleep(0.05)
+        self.assertTrue(self.second.add('lock', 2))
+        self.assertEqual(self.first.get('lock'), 2)
@@ -0,0 +1,55 @@
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+
+from django.core.signals import request_started
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.signals import tune_sqlite
+
+
+class ConnectionTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1024})
+    def test_sqlite_pragmas_are_set_on_connect(self):
+        tune_sqlite(sender=None, connection=connection)
+        self.assertEqual(self.pragma('cache_size'), -1024)
+
+    def test_default_pragmas(self):
+        # NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -64 * 2 ** 10)
+
+    def test_broken_connection_is_closed_on_first_use(self):
+        # Так отмечает соединения начало запроса
+        connection.health_check_done = False
+        with mock.patch.object(connection, 'is_usable',
+                               return_value=False) as is_usable, \
+                mock.patch.object(connection, 'close') as close:
+            self.pragma('synchronous')
+            self.pragma('synchronous')
+        is_usable.assert_called_once_with()
+        close.assert_called_once_with()
+
+    def test_usable_connection_is_kept(self):
+        connection.health_check_done = False
+        with mock.patch.object(connection, 'close') as close:
+            self.pragma('synchronous')
+        close.assert_not_called()
+        self.assertTrue(connection.health_check_done)
+
+    def test_request_without_queries_is_not_checked(self):
+        connection.health_check_done = False
+        with mock.patch.object(connection, 'is_usable') as is_usable:
+            request_started.send(sender=None)
+        is_usable.assert_not_called()
+
+    @skipUnless(find_spec('psycopg2'), 'psycopg2 не установлен')
+    def test_pool_forces_conn_max_age_zero(self):
+        from core.db.backends.postgresql_pool.base import DatabaseWrapper
+        wrapper = DatabaseWrapper({'CONN_MAX_AGE': 60, 'NAME': 'yatube'})
+        self.assertEqual(wrapper.settings_dict['CONN_MAX_AGE'], 0)
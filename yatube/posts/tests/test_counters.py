@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from users.models import Profile
+
+User = get_user_model()
+AUTHOR = 'аuthor'
+USERNAME = 'MyName'
+GROUP_URL = 'test_slug'
+SECOND_GROUP_URL = 'test_slug_2'
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_URL,
+            description='Тестовое описание',
+        )
+        cls.second_group = Group.objects.create(
+            title='Тестовая группа №2',
+            slug=SECOND_GROUP_URL,
+            description='Вторая группа',
+        )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertCounters(self, instance, **expected):
+        instance.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(instance, field), value)
+
+    def test_counters_track_writes(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новый пост', 'group': self.group.pk},
+        )
+        post = Post.objects.get(text='Новый пост')
+        self.assertCounters(self.user.profile, posts_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        # Перенос поста в другую группу
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'pk': post.pk}),
+            data={'text': 'Новый пост', 'group': self.second_group.pk},
+        )
+        self.assertCounters(self.group, posts_count=0)
+        self.assertCounters(self.second_group, posts_count=1)
+        # Комментарии
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'pk': post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertCounters(post, comments_count=1)
+        Comment.objects.all().delete()
+        self.assertCounters(post, comments_count=0)
+        # Подписки
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': AUTHOR}))
+        self.assertCounters(self.user.profile, following_count=1)
+        self.assertCounters(self.author.profile, followers_count=1)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': AUTHOR}))
+        self.assertCounters(self.user.profile, following_count=0)
+        self.assertCounters(self.author.profile, followers_count=0)
+        # Удаление поста
+        post.delete()
+        self.assertCounters(self.user.profile, posts_count=0)
+        self.assertCounters(self.second_group, posts_count=0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group)
+        Follow.objects.create(user=self.user, author=self.author)
+        Profile.objects.update(
+            posts_count=10, followers_count=10, following_count=10)
+        Group.objects.update(posts_count=10)
+        Post.objects.update(comments_count=10)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCounters(
+            self.author.profile, posts_count=1, followers_count=1)
+        self.assertCounters(self.user.profile, following_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        self.assertCounters(post, comments_count=0)
@@ -1,5 +1,8 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
+from PIL import Image
 from django.test import Client, TestCase, override_settings
 from django.core.cache import cache
 from django.urls import reverse
@@ -78,14 +81,15 @@ class PostCreateFormTests(TestCase):
         )
         self.assertRedirects(response, reverse(
             'posts:profile', kwargs={'username': USERNAME}))
-        self.assertTrue(
-            Post.objects.filter(
-                text='Тестовый текст2',
-                group=1,
-                image='posts/small.gif',
-                pk=self.posts_count + 1,
-            ).exists()
-        )
+        post = Post.objects.filter(
+            text='Тестовый текст2',
+            group=1,
+            pk=self.posts_count + 1,
+        ).first()
+        self.assertIsNotNone(post)
+        # Картинка хранится под хэшем своего содержимого
+        self.assertEqual(post.image.name, 'posts/{}.gif'.format(
+            hashlib.sha256(post.image.read()).hexdigest()[:32]))
         self.assertEqual(Post.objects.count(), self.posts_count + 1)
         self.assertEqual(response.status_code, 200)
 
@@ -201,3 +205,63 @@ class PostCreateFormTests(TestCase):
         )
         self.assertEqual(Comment.objects.count(), comment_count)
         self.assertEqual(response.status_code, 200)
+
+
+def jpeg_with_exif(size):
+    file = BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Камера'
+    Image.new('RGB', size, (255, 0, 0)).save(file, 'JPEG', exif=exif)
+    return SimpleUploadedFile('photo.jpg', file.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadLimitsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image, client=None):
+        return (client or self.authorized_client).post(
+            reverse('posts:post_create'),
+            data={'text': TEST_TEXT, 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_large_file_is_rejected(self):
+        response = self.create(jpeg_with_exif((50, 50)))
+        self.assertFormError(response, 'form', 'image', 'Файл больше 0 МБ.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_image_with_too_many_pixels_is_rejected(self):
+        response = self.create(jpeg_with_exif((50, 50)))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0 мегапикселей.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=40)
+    def test_image_is_downscaled_without_metadata(self):
+        self.create(jpeg_with_exif((80, 60)))
+        post = Post.objects.get()
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (40, 30))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = self.create(jpeg_with_exif((50, 50)), client)
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import moderation, thumbnails
+from posts.models import (
+    Comment, Follow, Group, Post, PostImageVariant, TimelineEntry)
+from posts.search import search_posts
+
+User = get_user_model()
+CHANGELIST_URL = reverse('admin:posts_post_changelist')
+
+
+@override_settings(MODERATION_BATCH_SIZE=2)
+class ModerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='-')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.spammer)
+        self.spam = [
+            Post.objects.create(
+                text=f'Спам {number}', author=self.spammer, group=self.group)
+            for number in range(5)
+        ]
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group)
+        for post in self.spam[:2] + [self.post]:
+            Comment.objects.create(
+                post=post, author=self.spammer, text='Спам в комментариях')
+        Comment.objects.create(
+            post=self.spam[0], author=self.author, text='Ответ')
+
+    def assertCounts(self, instance, **expected):
+        instance.refresh_from_db()
+        for field, value in expected.items():
+            self.assertEqual(getattr(instance, field), value, field)
+
+    def test_move_posts(self):
+        moved = moderation.move_posts(
+            Post.objects.filter(author=self.spammer), self.other_group)
+        self.assertEqual(moved, 5)
+        self.assertCounts(self.group, posts_count=1)
+        self.assertCounts(self.other_group, posts_count=5)
+        moved = moderation.move_posts(Post.objects.all(), None)
+        self.assertEqual(moved, 6)
+        self.assertCounts(self.group, posts_count=0)
+        self.assertCounts(self.other_group, posts_count=0)
+
+    def test_reassign_posts(self):
+        reassigned = moderation.reassign_posts(
+            Post.objects.filter(author=self.spammer), self.author)
+        self.assertEqual(reassigned, 5)
+        self.assertCounts(self.spammer.profile, posts_count=0)
+        self.assertCounts(self.author.profile, posts_count=6)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+    def test_delete_user_content(self):
+        comments, posts = moderation.delete_user_content([self.spammer.pk])
+        self.assertEqual((comments, posts), (3, 5))
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertCounts(self.spammer.profile, posts_count=0)
+        self.assertCounts(self.group, posts_count=1)
+        self.assertCounts(self.post, comments_count=0)
+        self.assertEqual(len(search_posts('спам')), 0)
+
+    def test_deleted_post_page_is_not_served_from_cache(self):
+        url = reverse('posts:post_detail', kwargs={'pk': self.spam[0].pk})
+        client = Client()
+        self.assertEqual(client.get(url).status_code, 200)
+        moderation.delete_posts(Post.objects.filter(pk=self.spam[0].pk))
+        self.assertEqual(client.get(url).status_code, 404)
+
+    def test_admin_actions(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        selected = [self.spam[0].pk]
+        response = client.post(CHANGELIST_URL, {
+            'action': 'move_to_group', 'group': 'other',
+            '_selected_action': selected,
+        }, follow=True)
+        self.assertContains(response, 'Перенесено постов: 1.')
+        self.assertCounts(self.other_group, posts_count=1)
+        action = {
+            'action': 'delete_authors_content',
+            '_selected_action': selected,
+        }
+        response = client.post(CHANGELIST_URL, action)
+        self.assertTemplateUsed(
+            response, 'admin/posts/delete_authors_content.html')
+        self.assertEqual(response.context['authors'], [(self.spammer, 5, 3)])
+        self.assertEqual(Post.objects.count(), 6)
+        response = client.post(
+            CHANGELIST_URL, {**action, 'post': 'yes'}, follow=True)
+        self.assertContains(response, 'Удалено постов: 5, комментариев: 3.')
+
+    def test_comment_admin_confirms_authors(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.post(
+            reverse('admin:posts_comment_changelist'), {
+                'action': 'delete_authors_content',
+                '_selected_action': list(
+                    Comment.objects.values_list('pk', flat=True)),
+            })
+        self.assertEqual(response.context['authors'], [
+            (self.author, 1, 1), (self.spammer, 5, 3)])
+        self.assertContains(response, 'name="post" value="yes"')
+
+    def test_deleted_posts_remove_unused_files(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            storage = Post._meta.get_field('image').storage
+            source = storage.save('posts/a.gif', ContentFile(b'gif'))
+            kept = storage.save('posts/b.gif', ContentFile(b'other gif'))
+            variant = storage.save('posts/a_320w.jpg', ContentFile(b'jpg'))
+            Post.objects.filter(pk=self.spam[0].pk).update(image=source)
+            Post.objects.filter(
+                pk__in=[self.spam[1].pk, self.post.pk]).update(image=kept)
+            PostImageVariant.objects.create(
+                post=self.spam[0], source=source, image=variant,
+                format='jpg', width=320, height=113)
+            with mock.patch.object(
+                    thumbnails, 'schedule_removal') as schedule_removal:
+                moderation.delete_posts(
+                    Post.objects.filter(author=self.spammer))
+            self.assertTrue(schedule_removal.called)
+            self.assertFalse(PostImageVariant.objects.exists())
+            # То, что выполнилось бы в фоне после фиксации
+            for call in schedule_removal.call_args_list:
+                thumbnails.remove_files(*call.args)
+            self.assertFalse(storage.exists(source))
+            self.assertFalse(storage.exists(variant))
+            self.assertTrue(storage.exists(kept))
@@ -2,7 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from posts.models import Post, Group
+from posts.models import Follow, Post, Group
 
 User = get_user_model()
 GROUP_URL = 'test_slug'
@@ -25,10 +25,14 @@ class PaginatorViewsTest(TestCase):
                 group=cls.group,
                 author=cls.user,
             )
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.user)
 
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
 
     def test_paginators(self):
 
@@ -44,3 +48,38 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']), 10)
                 response = self.authorized_client.get(reverse_name + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_paginators(self):
+        templates_page_names = (
+            (self.authorized_client, reverse('posts:index')),
+            (self.authorized_client,
+             reverse('posts:group_list', kwargs={'slug': GROUP_URL})),
+            (self.authorized_client,
+             reverse('posts:profile', kwargs={'username': self.post.author})),
+            (self.reader_client, reverse('posts:follow_index')),
+        )
+        for client, reverse_name in templates_page_names:
+            with self.subTest(reverse_name=reverse_name):
+                response = client.get(reverse_name + '?cursor=')
+                first_page = response.context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                response = client.get(
+                    reverse_name + '?cursor=' + first_page.next_cursor)
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                # Страницы не пересекаются и идут от новых постов к старым
+                posts = list(first_page) + list(second_page)
+                self.assertEqual(posts, list(
+                    Post.objects.order_by('-pub_date', '-pk')))
+                # Назад на первую страницу по курсору
+                response = client.get(
+                    reverse_name + '?cursor=' + second_page.previous_cursor)
+                self.assertEqual(
+                    list(response.context['page_obj']), list(first_page))
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?cursor=broken')
+        self.assertEqual(len(response.context['page_obj']), 10)
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+USERNAME = 'MyName'
+GROUP_URL = 'test_slug'
+# Сессия, пользователь, ключ свежести для условного GET, страница
+# постов, подсчёт для паджинатора и запросы самой страницы (группа,
+# автор, подписка, комментарии).
+FEED_BUDGET = 7
+# Ответ 304: сессия, пользователь и ключ свежести.
+NOT_MODIFIED_BUDGET = 3
+
+
+class FeedQueriesTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_URL,
+            description='Тестовое описание',
+        )
+        for i in range(12):
+            author = User.objects.create_user(username=f'author_{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            cls.post = Post.objects.create(
+                text=f'Post number {i}',
+                group=cls.group,
+                author=author,
+            )
+            Comment.objects.create(
+                text=f'Comment number {i}', post=cls.post, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_fit_query_budget(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:group_list', kwargs={'slug': GROUP_URL}),
+            reverse('posts:profile', kwargs={'username': self.post.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertQueryBudget(
+                    self.authorized_client, url, FEED_BUDGET)
+
+    def test_not_modified_pages_skip_rendering(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': GROUP_URL}),
+            reverse('posts:profile', kwargs={'username': self.post.author}),
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+        )
+        guest_client = Client()
+        for client, budget in ((self.authorized_client, NOT_MODIFIED_BUDGET),
+                               (guest_client, 1)):
+            for url in urls:
+                with self.subTest(url=url, budget=budget):
+                    etag = client.get(url)['ETag']
+                    with self.assertNumQueries(budget):
+                        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_etag_depends_on_viewer_and_data(self):
+        url = reverse('posts:index')
+        etag = Client().get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
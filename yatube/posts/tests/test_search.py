@@ -0,0 +1,194 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.backends.utils import CursorWrapper
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, SearchIndexCheckpoint
+from posts.search import search_posts
+from posts.views import POSTS_PER_PAGE
+
+User = get_user_model()
+AUTHOR = 'аuthor'
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Зелёный попугай живёт в клетке', author=self.author)
+        self.other = Post.objects.create(
+            text='Просто заметка', author=self.author)
+
+    def found(self, query):
+        return list(search_posts(query))
+
+    def test_post_text_is_found(self):
+        self.assertEqual(self.found('попугай'), [self.post])
+        self.assertEqual(self.found('ПОПУГАЙ клетке'), [self.post])
+        self.assertEqual(self.found('попугай заметка'), [])
+
+    def test_comments_are_found(self):
+        comment = Comment.objects.create(
+            post=self.other, author=self.author, text='А где попугай?')
+        self.assertEqual(self.found('попугай'), [self.post, self.other])
+        comment.delete()
+        self.assertEqual(self.found('попугай'), [self.post])
+
+    def test_words_may_be_split_between_post_and_comments(self):
+        Comment.objects.create(
+            post=self.other, author=self.author, text='Про попугая')
+        Comment.objects.create(
+            post=self.other, author=self.author, text='И про клетку')
+        self.assertEqual(self.found('заметка попугая клетку'), [self.other])
+        self.assertEqual(self.found('заметка кит'), [])
+
+    def test_comment_write_touches_only_its_row(self):
+        comments = [
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Комментарий {i}')
+            for i in range(3)
+        ]
+        with mock.patch.object(search.SqliteBackend, '_write') as write:
+            comments[0].text = 'Правка'
+            comments[0].save()
+        write.assert_called_once_with(
+            search.COMMENTS_TABLE, ('text', 'post_id'),
+            [(comments[0].pk, 'Правка', self.post.pk)])
+
+    def test_rows_are_written_without_executemany(self):
+        # executemany ломает SQL-панель debug toolbar
+        with mock.patch.object(CursorWrapper, 'executemany',
+                               side_effect=AssertionError), \
+                mock.patch.object(search, 'INSERT_BATCH_SIZE', 2):
+            comments = [
+                Comment.objects.create(
+                    post=self.other, author=self.author, text='Про кита')
+                for _ in range(2)
+            ]
+            search.backend().write_comments(
+                (comment.pk, 'Про кита', comment.post_id) for comment
+                in comments + [Comment.objects.create(
+                    post=self.post, author=self.author, text='кит')])
+        self.assertCountEqual(self.found('кита'), [self.post, self.other])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.post.text = 'Синий кит'
+        self.post.save()
+        self.assertEqual(self.found('попугай'), [])
+        self.assertEqual(self.found('кит'), [self.post])
+        self.post.delete()
+        self.assertEqual(self.found('кит'), [])
+
+    def test_query_syntax_is_not_passed_to_index(self):
+        self.assertEqual(self.found('"попугай*) -'), [self.post])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_results_are_paginated(self):
+        for number in range(POSTS_PER_PAGE):
+            Post.objects.create(
+                text=f'Попугай №{number}', author=self.author)
+        response = Client().get(SEARCH_URL, {'q': 'попугай', 'page': 2})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, POSTS_PER_PAGE + 1)
+        self.assertEqual(len(page_obj), 1)
+        self.assertContains(response, '?q=%D0%BF')
+
+    def test_empty_query_shows_form(self):
+        response = Client().get(SEARCH_URL)
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertIsNone(response.context['page_obj'])
+
+
+class RebuildSearchIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command('rebuild_search_index', *args, stdout=out)
+        return out.getvalue()
+
+    def test_rebuild_indexes_posts_in_batches(self):
+        Post.objects.bulk_create(
+            Post(text=f'Импорт {number}', author=self.author)
+            for number in range(5)
+        )
+        # Комментарий индексирует только себя - посты в индексе не видны
+        Comment.objects.create(
+            post=Post.objects.first(), author=self.author,
+            text='Комментарий к импорту')
+        self.assertEqual(len(search_posts('комментарий')), 1)
+        self.assertEqual(len(search_posts('импорт')), 0)
+        out = self.rebuild('--batch-size', '2')
+        self.assertIn('Проиндексировано 2 из 5', out)
+        self.assertIn('Проиндексировано 5 из 5', out)
+        self.assertEqual(len(search_posts('импорт')), 5)
+        self.assertEqual(len(search_posts('комментарий')), 1)
+
+    def test_incremental_starts_from_checkpoint(self):
+        Post.objects.create(text='Старый пост', author=self.author)
+        self.rebuild()
+        last = Post.objects.latest('pub_date')
+        checkpoint = SearchIndexCheckpoint.objects.get()
+        self.assertEqual(checkpoint.post_pk, last.pk)
+        search.backend().clear()
+        Post.objects.bulk_create([Post(text='Новый пост', author=self.author)])
+        out = self.rebuild('--incremental')
+        self.assertIn('Проиндексировано 1 из 1', out)
+        self.assertEqual(len(search_posts('новый')), 1)
+        self.assertEqual(len(search_posts('старый')), 0)
+        self.assertNotIn('Проиндексировано', self.rebuild('--incremental'))
+
+    def test_incremental_indexes_new_comments_on_old_posts(self):
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        self.rebuild()
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.author, text='Поздний отзыв')])
+        self.assertEqual(len(search_posts('отзыв')), 0)
+        out = self.rebuild('--incremental')
+        self.assertIn('Комментарии: проиндексировано 1 из 1', out)
+        self.assertEqual(list(search_posts('отзыв')), [post])
+        self.assertEqual(
+            SearchIndexCheckpoint.objects.get().comment_pk,
+            Comment.objects.get().pk)
+
+    def test_interrupted_rebuild_keeps_live_index(self):
+        Post.objects.bulk_create(
+            Post(text=f'Импорт {number}', author=self.author)
+            for number in range(3)
+        )
+        live = Post.objects.create(text='Импорт живой', author=self.author)
+        write = search.SqliteBackend.write
+
+        def fail_second_batch(backend, rows):
+            if backend.shadow and SearchIndexCheckpoint.objects.filter(
+                    post_pk__isnull=False).exists():
+                raise RuntimeError
+            write(backend, rows)
+
+        with mock.patch.object(
+                search.SqliteBackend, 'write', fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.rebuild('--batch-size', '2')
+        # Поиск идёт по старому индексу, а новые записи попадают в оба
+        self.assertEqual(list(search_posts('импорт')), [live])
+        Comment.objects.create(
+            post=live, author=self.author, text='Свежий отзыв')
+        out = self.rebuild('--incremental')
+        self.assertIn('Проиндексировано 2 из 2', out)
+        self.assertIn('Новый индекс подключён', out)
+        self.assertEqual(len(search_posts('импорт')), 4)
+        self.assertEqual(list(search_posts('отзыв')), [live])
+        self.assertFalse(search.backend().rebuilding())
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, SimpleTestCase
+
+from core.storage import ContentHashStorage, is_hashed
+from core.views import serve_media
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ContentHashStorageTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentHashStorage(location=TEMP_MEDIA_ROOT)
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('posts/a.GIF', ContentFile(b'image'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'image'))
+        other = self.storage.save('posts/a.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('posts/'))
+        self.assertTrue(first.endswith('.gif'))
+        self.assertTrue(is_hashed(first))
+        self.assertEqual(len(os.listdir(self.storage.path('posts'))), 2)
+
+    def test_hashed_media_is_cached_forever(self):
+        name = self.storage.save('posts/a.gif', ContentFile(b'image'))
+        request = RequestFactory().get('/')
+        response = serve_media(request, name, document_root=TEMP_MEDIA_ROOT)
+        self.assertIn('immutable', response['Cache-Control'])
+        os.makedirs(self.storage.path('plain'), exist_ok=True)
+        with open(self.storage.path('plain/a.gif'), 'wb') as file:
+            file.write(b'image')
+        response = serve_media(
+            request, 'plain/a.gif', document_root=TEMP_MEDIA_ROOT)
+        self.assertFalse(response.has_header('Cache-Control'))
@@ -1,8 +1,16 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.paginator import Paginator
+from django.test import Client, TestCase, override_settings
 from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.urls import reverse
-from posts.models import Post, Group, Follow
+from posts.follows import follow, unfollow
+from posts.paginators import CursorPaginator
+from posts import timeline
+from posts.timeline import timeline_posts
+from posts.models import Post, Group, Follow, TimelineEntry
 
 
 User = get_user_model()
@@ -96,3 +104,139 @@ class PostsPagesTests(TestCase):
         self.authorized_client.force_login(follower2)
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertNotIn(self.post, response.context['page_obj'])
+
+    # Лента подписок заполняется при записи
+    def test_timeline_is_filled_on_write(self):
+        follower = User.objects.create_user(username=USERNAME)
+        # Подписка добавляет в ленту старые посты автора
+        Follow.objects.create(user=follower, author=self.user)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follower, post=self.post).exists())
+        # Новый пост раскладывается по лентам подписчиков
+        new_post = Post.objects.create(text=TEST_TEXT, author=self.user)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follower, post=new_post).exists())
+        # Отписка очищает ленту от постов автора
+        Follow.objects.filter(user=follower, author=self.user).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=follower).exists())
+
+    # Посты знаменитостей подмешиваются в ленту при чтении
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2,
+                       TIMELINE_CELEBRITY_RELEASE_THRESHOLD=2)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        follower = User.objects.create_user(username=USERNAME)
+        follower2 = User.objects.create_user(username='YourName')
+        Follow.objects.create(user=follower, author=self.user)
+        Follow.objects.create(user=follower2, author=self.user)
+        new_post = Post.objects.create(text=TEST_TEXT, author=self.user)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        self.authorized_client.force_login(follower2)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+        self.assertIn(self.post, response.context['page_obj'])
+        # Автор снова обычный: посты раскладываются не в запросе
+        # отписки, а в фоне, и до тех пор подмешиваются при чтении
+        with mock.patch.object(timeline, 'schedule_release') as schedule:
+            Follow.objects.filter(user=follower).delete()
+        schedule.assert_called_once_with(self.user.pk)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=follower2, post=new_post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+        timeline.release(self.user.pk)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follower2, post=new_post).exists())
+        self.assertFalse(timeline.is_celebrity(self.user.pk))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, self.post])
+
+    # Автор на границе порога не переключается туда и обратно
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=3,
+                       TIMELINE_CELEBRITY_RELEASE_THRESHOLD=2)
+    def test_celebrity_threshold_has_hysteresis(self):
+        readers = [User.objects.create_user(username=f'reader_{i}')
+                   for i in range(3)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.user)
+        self.assertTrue(timeline.is_celebrity(self.user.pk))
+        with mock.patch.object(timeline, 'schedule_release') as schedule:
+            Follow.objects.filter(user=readers[0]).delete()
+            schedule.assert_not_called()
+            Follow.objects.create(user=readers[0], author=self.user)
+            self.assertFalse(TimelineEntry.objects.filter(
+                user=readers[0]).exists())
+            Follow.objects.filter(user__in=readers[:2]).delete()
+        schedule.assert_called_with(self.user.pk)
+        self.assertTrue(timeline.is_celebrity(self.user.pk))
+
+    # Записи ленты и посты знаменитостей сливаются в порядке дат
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+    def test_timeline_merges_celebrity_posts(self):
+        follower = User.objects.create_user(username=USERNAME)
+        star = User.objects.create_user(username='star')
+        Follow.objects.create(user=follower, author=self.user)
+        Post.objects.create(text=TEST_TEXT, author=star)
+        # Пост разложен по ленте, пока автор не стал знаменитостью
+        Follow.objects.create(user=follower, author=star)
+        Follow.objects.create(
+            user=User.objects.create_user(username='YourName'), author=star)
+        for i in range(3):
+            Post.objects.create(text=TEST_TEXT, author=star)
+            Post.objects.create(text=TEST_TEXT, author=self.user)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        timeline = timeline_posts(follower)
+        self.assertEqual(timeline.count(), len(expected))
+        self.assertEqual(timeline.latest(),
+                         (expected[0].pub_date, expected[0].pk))
+        paginator = Paginator(timeline, 3)
+        self.assertEqual(
+            [post for number in paginator.page_range
+             for post in paginator.page(number)],
+            expected,
+        )
+        paginator = CursorPaginator(timeline, 3)
+        page = paginator.get_page(None)
+        posts = list(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            posts += page
+        self.assertEqual(posts, expected)
+        page = paginator.get_page(page.previous_cursor)
+        self.assertEqual(list(page), expected[3:6])
+
+    # Повторная подписка не создаёт дубликатов
+    def test_follow_is_unique(self):
+        follower = User.objects.create_user(username=USERNAME)
+        Follow.objects.create(user=follower, author=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=follower, author=self.user)
+
+    # Массовая подписка идемпотентна
+    def test_bulk_follow_is_idempotent(self):
+        follower = User.objects.create_user(username=USERNAME)
+        authors = [self.user] + [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(3)
+        ]
+        follow(follower, authors + [follower])
+        # Повторная подписка - один INSERT, который ничего не создал:
+        # ни счётчиков, ни досыпания ленты
+        with self.assertNumQueries(1):
+            follow(follower, authors)
+        follow(follower, authors[:1] + [
+            User.objects.create_user(username='author_new')])
+        authors = User.objects.filter(following__user=follower)
+        self.assertEqual(follower.follower.count(), 5)
+        follower.profile.refresh_from_db()
+        self.assertEqual(follower.profile.following_count, 5)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follower, post=self.post).exists())
+        unfollow(follower, authors)
+        self.assertEqual(follower.follower.count(), 0)
+        follower.profile.refresh_from_db()
+        self.assertEqual(follower.profile.following_count, 0)
@@ -0,0 +1,26 @@
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from core.warmup import template_names, warm_templates
+from posts.management.commands.bench_templates import templates_setting
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_warmup_skips_engines_without_cache(self):
+        with override_settings(TEMPLATES=templates_setting(cached=False)):
+            self.assertEqual(warm_templates(), 0)
+
+    @override_settings(TEMPLATES=templates_setting(cached=True))
+    def test_all_templates_are_cached_at_startup(self):
+        engine = engines['django'].engine
+        names = template_names(engine)
+        self.assertIn('posts/index.html', names)
+        self.assertIn('includes/header.html', names)
+        self.assertIn('admin/posts/post/change_list.html', names)
+        # Шаблоны Django и сторонних пакетов не прогреваются
+        self.assertNotIn('admin/base.html', names)
+        self.assertNotIn('debug_toolbar/base.html', names)
+        self.assertEqual(warm_templates(), len(names))
+        loader = engine.template_loaders[0]
+        self.assertIn('posts/includes/paginator.html', {
+            key.split(':')[0] for key in loader.get_template_cache})
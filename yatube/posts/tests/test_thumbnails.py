@@ -0,0 +1,199 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from core import background
+from posts import thumbnails
+from posts.models import Post, User
+from posts.templatetags.post_images import post_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+GEOMETRY, OPTIONS = thumbnails.THUMBNAILS[0]
+
+
+def gif(name, color):
+    file = BytesIO()
+    Image.new('RGB', (4, 2), color).save(file, 'GIF')
+    return SimpleUploadedFile(name, file.getvalue(), 'image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='аuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.forget()
+        with mock.patch.object(thumbnails, 'schedule'):
+            self.post = Post.objects.create(
+                text='Тестовый текст',
+                author=self.user,
+                image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+            )
+
+    def test_page_gets_source_until_thumbnail_is_built(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            image = get_thumbnail(self.post.image, GEOMETRY, **OPTIONS)
+        schedule.assert_called_once_with(self.post.pk)
+        self.assertEqual(image.name, self.post.image.name)
+        self.assertEqual((image.width, image.height), (960, 339))
+
+    def test_built_thumbnail_is_served(self):
+        thumbnails.generate(self.post.pk)
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            image = get_thumbnail(self.post.image, GEOMETRY, **OPTIONS)
+        schedule.assert_not_called()
+        self.assertNotEqual(image.name, self.post.image.name)
+        self.assertTrue(image.exists())
+        self.assertEqual((image.width, image.height), (960, 339))
+
+    def test_files_of_deleted_posts_are_removed(self):
+        thumbnails.generate(self.post.pk)
+        image = get_thumbnail(self.post.image, GEOMETRY, **OPTIONS)
+        variants = list(self.post.image_variants.values_list(
+            'image', flat=True))
+        self.assertTrue(variants)
+        source = self.post.image.name
+        self.post.delete()
+        thumbnails.remove_files([source], variants)
+        self.assertFalse(image.exists())
+        storage = self.post.image.storage
+        self.assertFalse(storage.exists(source))
+        self.assertFalse(any(storage.exists(name) for name in variants))
+
+    def test_failed_build_is_not_retried_at_once(self):
+        key = thumbnails.QUEUED_KEY.format(self.post.pk)
+        cache.set(key, True)
+        with mock.patch.object(thumbnails, 'build_variants',
+                               side_effect=OSError), \
+                self.assertLogs(thumbnails.logger, 'ERROR'):
+            thumbnails.generate(self.post.pk)
+        self.assertTrue(cache.get(key))
+        thumbnails.generate(self.post.pk)
+        self.assertIsNone(cache.get(key))
+
+    def test_jobs_run_in_background_thread(self):
+        done = threading.Event()
+        names = []
+
+        def job(name):
+            names.append((name, threading.current_thread().name))
+            done.set()
+
+        with mock.patch.object(background, 'shares_memory_db',
+                               return_value=False):
+            background.submit(job, 'thumbnails')
+        self.assertTrue(done.wait(5))
+        self.assertEqual(names[0][0], 'thumbnails')
+        self.assertTrue(names[0][1].startswith('background'))
+
+    def test_only_new_image_is_scheduled(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.post.text = 'Новый текст'
+            self.post.save()
+            schedule.assert_not_called()
+            self.post.image = gif('other.gif', 'blue')
+            self.post.save()
+        schedule.assert_called_once_with(self.post.pk)
+
+    def test_page_thumbnails_are_loaded_at_once(self):
+        posts = [self.post] + [
+            Post.objects.create(
+                text='Тестовый текст',
+                author=self.user,
+                image=gif(f'small_{number}.gif', color),
+            )
+            for number, color in enumerate(('red', 'green', 'blue'))
+        ]
+        for post in posts[:2]:
+            thumbnails.generate(post.pk)
+        cache.clear()
+        thumbnails.forget()
+        # Варианты картинок и метаданные миниатюр
+        with self.assertNumQueries(2):
+            thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            with mock.patch.object(thumbnails, 'schedule'):
+                images = [
+                    get_thumbnail(post.image, GEOMETRY, **OPTIONS)
+                    for post in posts
+                ]
+                for post in posts:
+                    post_image(post)
+        self.assertTrue(images[1].exists())
+        self.assertEqual(images[3].name, posts[3].image.name)
+
+    def test_variants_are_built_for_every_width(self):
+        thumbnails.generate(self.post.pk)
+        formats = [
+            extension for _, extension, _ in thumbnails.variant_formats()]
+        variants = self.post.image_variants.all()
+        stem = os.path.splitext(self.post.image.name)[0]
+        self.assertEqual(
+            sorted((variant.format, variant.width) for variant in variants),
+            sorted((extension, width) for extension in formats
+                   for width in thumbnails.VARIANT_WIDTHS),
+        )
+        for variant in variants:
+            with self.subTest(image=variant.image.name):
+                self.assertTrue(variant.image.name.startswith(stem))
+                self.assertEqual(variant.height, round(
+                    variant.width * thumbnails.VARIANT_RATIO))
+                self.assertTrue(variant.image.storage.exists(
+                    variant.image.name))
+
+    def test_post_image_uses_variants_srcset(self):
+        with mock.patch.object(thumbnails, 'schedule'):
+            context = post_image(self.post)
+        self.assertIsNone(context['fallback'])
+        thumbnails.generate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        context = post_image(post)
+        self.assertEqual(context['fallback'].width,
+                         thumbnails.VARIANT_WIDTHS[-1])
+        for width in thumbnails.VARIANT_WIDTHS:
+            self.assertIn(f'_{width}w.jpg {width}w', context['jpeg_srcset'])
+
+    def test_same_image_shares_variants(self):
+        thumbnails.generate(self.post.pk)
+        with mock.patch.object(thumbnails, 'schedule'):
+            copy = Post.objects.create(
+                text='Копия',
+                author=self.user,
+                image=SimpleUploadedFile('copy.gif', SMALL_GIF, 'image/gif'),
+            )
+        self.assertEqual(copy.image.name, self.post.image.name)
+        thumbnails.generate(copy.pk)
+        names = sorted(self.post.image_variants.values_list(
+            'image', flat=True))
+        self.assertEqual(sorted(copy.image_variants.values_list(
+            'image', flat=True)), names)
+        thumbnails.remove_variants(copy)
+        storage = self.post.image.storage
+        self.assertTrue(all(storage.exists(name) for name in names))
@@ -0,0 +1,293 @@
+"""Миниатюры картинок постов, которые готовятся заранее.
+
+Все размеры, которые выводят шаблоны, строятся в фоновом потоке
+(core.background) после сохранения поста. Страница миниатюры не
+строит: если её ещё нет (старый пост, неудачная попытка), тег
+{% thumbnail %} получает исходную картинку, а построение ставится
+в очередь.
+
+Шаблоны должны запрашивать только размеры из THUMBNAILS.
+
+Кроме них строятся варианты картинки нескольких ширин в WebP и JPEG
+(PostImageVariant), из которых шаблон собирает srcset.
+
+Метаданные миниатюр (имя файла и размер) лежат в PrefetchKVStore.
+Лента загружает их для всей страницы одним обращением к кэшу и
+одним запросом к базе, после чего теги {% thumbnail %} читают их
+из памяти.
+"""
+import logging
+import os
+import threading
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.parsers import parse_geometry
+
+from core import background
+
+from .models import Post, PostImageVariant
+
+# Размер и параметры {% thumbnail %} из шаблонов posts
+THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# Ширины вариантов для srcset; пропорции те же, что у миниатюры ленты
+VARIANT_WIDTHS = (320, 640, 960)
+VARIANT_RATIO = 339 / 960
+VARIANT_FORMATS = (
+    ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+QUEUED_KEY = 'thumbnails:queued:{}'
+# Сколько секунд не ставить пост в очередь повторно; после ошибки
+# построение повторяется не раньше
+QUEUED_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+def generate(post_id):
+    """Строит все миниатюры картинки поста."""
+    from .signals import bump_post
+
+    forget()
+    try:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is None or not post.image:
+            return
+        backend = ThumbnailBackend()
+        for geometry, options in THUMBNAILS:
+            backend.get_thumbnail(post.image, geometry, **options)
+        if not post.image_variants.filter(source=post.image.name).exists():
+            build_variants(post)
+        # В кэше могли остаться карточки с исходной картинкой
+        bump_post(post)
+    except Exception:
+        # Битая или пропавшая картинка не должна мешать сохранению поста,
+        # а страницы не должны ставить её в очередь на каждый показ
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+    else:
+        cache.delete(QUEUED_KEY.format(post_id))
+
+
+def variant_formats():
+    # Pillow может быть собран без WebP - тогда остаётся только JPEG
+    return [
+        variant for variant in VARIANT_FORMATS
+        if variant[0] != 'WEBP' or features.check('webp')
+    ]
+
+
+def remove_variants(post):
+    """Удаляет варианты картинки поста и файлы, которые больше не нужны."""
+    for variant in post.image_variants.all():
+        shared = PostImageVariant.objects.filter(
+            image=variant.image.name).exclude(post=post).exists()
+        if not shared:
+            variant.image.delete(save=False)
+    post.image_variants.all().delete()
+
+
+def build_variants(post):
+    """Заменяет варианты картинки поста новыми.
+
+    Если та же картинка уже есть у другого поста (одинаковые загрузки
+    хранятся в одном файле), её варианты переиспользуются.
+    """
+    remove_variants(post)
+    donor = PostImageVariant.objects.filter(
+        source=post.image.name).values_list('post', flat=True).first()
+    if donor is not None:
+        PostImageVariant.objects.bulk_create(
+            PostImageVariant(
+                post=post, source=variant.source, image=variant.image.name,
+                format=variant.format, width=variant.width,
+                height=variant.height,
+            )
+            for variant in PostImageVariant.objects.filter(
+                post=donor, source=post.image.name)
+        )
+        return
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    with post.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    variants = []
+    for width in VARIANT_WIDTHS:
+        size = (width, round(width * VARIANT_RATIO))
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        for image_format, extension, options in variant_formats():
+            variant = PostImageVariant(
+                post=post, source=post.image.name, format=extension,
+                width=size[0], height=size[1],
+            )
+            filename = f'{stem}_{width}w.{extension}'
+            name = variant.image.field.generate_filename(variant, filename)
+            if variant.image.storage.exists(name):
+                # Имя выводится из хэша исходника, значит файл тот же
+                variant.image.name = name
+            else:
+                buffer = BytesIO()
+                resized.save(buffer, image_format, **options)
+                variant.image.save(filename, ContentFile(buffer.getvalue()),
+                                   save=False)
+            variants.append(variant)
+    PostImageVariant.objects.bulk_create(variants)
+
+
+def remove_files(sources, variants):
+    """Удаляет файлы удалённых постов, если другие посты их не используют.
+
+    sources - имена исходных картинок: удаляются они сами и их
+    миниатюры sorl; variants - имена файлов PostImageVariant.
+    Одинаковые загрузки хранятся в одном файле, поэтому используемые
+    файлы не трогаем.
+    """
+    used = set(PostImageVariant.objects.filter(
+        image__in=variants).values_list('image', flat=True))
+    storage = PostImageVariant._meta.get_field('image').storage
+    for name in set(variants) - used:
+        storage.delete(name)
+    used = set(Post.objects.filter(
+        image__in=sources).values_list('image', flat=True))
+    storage = Post._meta.get_field('image').storage
+    for name in set(sources) - used:
+        default.kvstore.delete(ImageFile(name, storage))
+        storage.delete(name)
+
+
+def schedule_removal(sources, variants):
+    """Удаляет файлы в фоне после фиксации транзакции."""
+    if sources or variants:
+        transaction.on_commit(
+            lambda: background.submit(remove_files, sources, variants))
+
+
+def schedule(post_id):
+    """Ставит построение миниатюр в очередь после фиксации транзакции."""
+    def submit():
+        if cache.add(QUEUED_KEY.format(post_id), True, QUEUED_TIMEOUT):
+            background.submit(generate, post_id)
+    transaction.on_commit(submit)
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Отдаёт только готовые миниатюры и никогда не строит их сама."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        name = self.thumbnail_name(source, geometry_string, options)
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+        instance = getattr(file_, 'instance', None)
+        # Без фонового потока построение пришлось бы на сам запрос
+        if background.executor is not None and getattr(instance, 'pk', None):
+            schedule(instance.pk)
+        # Пока миниатюры нет, показываем исходник в рамке нужного размера
+        source.set_size(parse_geometry(geometry_string))
+        return source
+
+    def thumbnail_name(self, source, geometry_string, options):
+        # Параметры по умолчанию те же, что у ThumbnailBackend.get_thumbnail,
+        # иначе имя не совпадёт с именем построенной миниатюры.
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+class PrefetchKVStore(KVStore):
+    """Хранилище метаданных миниатюр с загрузкой пачкой.
+
+    Загруженное хранится в памяти потока до конца запроса.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.local = threading.local()
+
+    @property
+    def memo(self):
+        if not hasattr(self.local, 'memo'):
+            self.local.memo = {}
+        return self.local.memo
+
+    def forget(self):
+        self.local.memo = {}
+
+    def prefetch(self, images):
+        """Загружает метаданные миниатюр THUMBNAILS для всех картинок."""
+        backend = DeferredThumbnailBackend()
+        keys = set()
+        for image in images:
+            source = ImageFile(image)
+            for geometry, options in THUMBNAILS:
+                name = backend.thumbnail_name(source, geometry, dict(options))
+                keys.add(add_prefix(ImageFile(name, default.storage).key))
+        keys -= self.memo.keys()
+        if not keys:
+            return
+        found = self.cache.get_many(keys)
+        missing = keys - found.keys()
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            for key in missing:
+                found[key] = stored.get(key, EMPTY_VALUE)
+            self.cache.set_many(
+                {key: found[key] for key in missing},
+                sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+        self.memo.update(found)
+
+    def _get_raw(self, key):
+        if key not in self.memo:
+            value = super()._get_raw(key)
+            self.memo[key] = EMPTY_VALUE if value is None else value
+        value = self.memo[key]
+        return None if value == EMPTY_VALUE else value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self.memo[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self.memo.pop(key, None)
+
+
+def prefetch(posts):
+    """Загружает варианты и метаданные миниатюр картинок постов страницы."""
+    posts = [post for post in posts if post.image]
+    prefetch_related_objects(posts, 'image_variants')
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'prefetch'):
+        kvstore.prefetch(post.image for post in posts)
+
+
+def forget():
+    """Сбрасывает загруженные в память потока метаданные."""
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'forget'):
+        kvstore.forget()
@@ -0,0 +1,238 @@
+"""Лента подписок, материализованная при записи (fan-out-on-write).
+
+Каждый новый пост раскладывается по лентам подписчиков автора,
+подписка досыпает в ленту старые посты автора, отписка их убирает.
+Чтение ленты - диапазон записей по индексу (user, -pub_date) с LIMIT,
+после чего посты страницы загружаются по pk.
+
+Посты "знаменитостей" (Profile.celebrity) по лентам не раскладываются,
+а подмешиваются при чтении, чтобы один пост не порождал сотни тысяч
+вставок: для каждого такого автора читается не больше постов, чем
+нужно странице, и выборки сливаются с записями ленты.
+
+Автор становится знаменитостью, когда подписчиков становится
+TIMELINE_CELEBRITY_THRESHOLD, а перестаёт - когда их меньше
+TIMELINE_CELEBRITY_RELEASE_THRESHOLD. Разрыв между порогами не даёт
+автору на границе переключаться туда и обратно. Посты бывшей
+знаменитости раскладываются по лентам в фоновом потоке (release),
+а до тех пор подмешиваются при чтении.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core import background
+from users.models import Profile
+
+from .models import Follow, Post, TimelineEntry
+from .paginators import PREVIOUS, keyset
+
+RELEASE_KEY = 'timeline:release:{}'
+# Сколько секунд не ставить автора в очередь повторно
+RELEASE_TIMEOUT = 60 * 60
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def followers(author_id):
+    return Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True)
+
+
+def celebrity_state(author_id):
+    """(число подписчиков, знаменитость ли) автора."""
+    return Profile.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'celebrity').first() or (0, False)
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(user_id=author_id, celebrity=True).exists()
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers(post.author_id).iterator()
+    )
+
+
+def backfill(user_id, author_id, since=None):
+    """Добавляет в ленту читателя посты автора (с даты since или все)."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    posts = posts.values_list('pk', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=pk,
+                      author_id=author_id, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id).delete()
+
+
+def reassigned(post_ids, author_id):
+    """Переносит посты в ленты подписчиков их нового автора."""
+    TimelineEntry.objects.filter(post_id__in=post_ids).delete()
+    if is_celebrity(author_id):
+        return
+    posts = list(Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'pub_date'))
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=pk,
+                      author_id=author_id, pub_date=pub_date)
+        for user_id in followers(author_id).iterator()
+        for pk, pub_date in posts
+    )
+
+
+def followed(user_id, author_id):
+    """Обрабатывает новую подписку."""
+    count, celebrity = celebrity_state(author_id)
+    if not celebrity and count >= settings.TIMELINE_CELEBRITY_THRESHOLD:
+        # Уже разложенные посты остаются в лентах, новые подмешиваются
+        # при чтении
+        Profile.objects.filter(user_id=author_id).update(celebrity=True)
+        celebrity = True
+    if not celebrity:
+        backfill(user_id, author_id)
+
+
+def unfollowed(user_id, author_id):
+    """Обрабатывает отписку."""
+    prune(user_id, author_id)
+    count, celebrity = celebrity_state(author_id)
+    if celebrity and count < settings.TIMELINE_CELEBRITY_RELEASE_THRESHOLD:
+        schedule_release(author_id)
+
+
+def schedule_release(author_id):
+    """Ставит release(author_id) в фоновую очередь после фиксации."""
+    def submit():
+        if cache.add(RELEASE_KEY.format(author_id), True, RELEASE_TIMEOUT):
+            background.submit(release, author_id)
+    transaction.on_commit(submit)
+
+
+def pending_releases():
+    """Знаменитости, у которых подписчиков меньше нижнего порога."""
+    return Profile.objects.filter(
+        celebrity=True,
+        followers_count__lt=settings.TIMELINE_CELEBRITY_RELEASE_THRESHOLD,
+    )
+
+
+def release(author_id):
+    """Раскладывает посты бывшей знаменитости по лентам подписчиков.
+
+    Пока это идёт, автор остаётся знаменитостью, и посты подмешиваются
+    при чтении. После снятия отметки досыпаются посты, вышедшие за
+    это время, и ленты новых подписчиков, а записи у отписавшихся
+    удаляются.
+    """
+    try:
+        pending = pending_releases().filter(user_id=author_id)
+        if not pending.exists():
+            return
+        started = timezone.now()
+        readers = set(followers(author_id))
+        for user_id in readers:
+            backfill(user_id, author_id)
+        if pending.update(celebrity=False):
+            for user_id in followers(author_id).iterator():
+                backfill(user_id, author_id,
+                         started if user_id in readers else None)
+        TimelineEntry.objects.filter(author_id=author_id).exclude(
+            user_id__in=followers(author_id)).delete()
+    finally:
+        cache.delete(RELEASE_KEY.format(author_id))
+
+
+class Timeline:
+    """Лента подписок по убыванию (pub_date, pk).
+
+    sources - выборки с полями pub_date и id поста (имя поля - вторым
+    элементом пары). Каждая читается с LIMIT, строки сливаются, и
+    только посты страницы загружаются из таблицы постов. Отдаёт число
+    постов и срезы для Paginator, а keyset() - для CursorPaginator.
+    """
+
+    def __init__(self, sources, direction=None, pub_date=None, pk=None):
+        self.sources = sources
+        self.cursor = (direction, pub_date, pk)
+
+    def keyset(self, direction=None, pub_date=None, pk=None):
+        return Timeline(self.sources, direction, pub_date, pk)
+
+    def querysets(self):
+        """Выборки (pub_date, id поста) в порядке ленты."""
+        return [
+            keyset(queryset, *self.cursor, pk_field=pk_field).values_list(
+                'pub_date', pk_field)
+            for queryset, pk_field in self.sources
+        ]
+
+    def rows(self, stop):
+        descending = self.cursor[0] != PREVIOUS
+        return list(islice(heapq.merge(
+            *(queryset[:stop] for queryset in self.querysets()),
+            reverse=descending,
+        ), stop))
+
+    def latest(self):
+        """(дата, pk) последнего поста ленты или None."""
+        rows = self.rows(1)
+        return rows[0] if rows else None
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if stop <= start:
+            return []
+        ids = [pk for _, pk in self.rows(stop)[start:]]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def timeline_posts(user):
+    """Лента подписок пользователя вместе с постами знаменитостей."""
+    entries = TimelineEntry.objects.filter(user_id=user.pk)
+    pulled = list(Follow.objects.filter(
+        user_id=user.pk, author__profile__celebrity=True
+    ).values_list('author_id', flat=True))
+    if pulled:
+        # Старые записи, разложенные до того, как автор стал
+        # знаменитостью, не должны повторять подмешанные посты
+        entries = entries.exclude(author_id__in=pulled)
+    return Timeline([(entries, 'post_id')] + [
+        (Post.objects.filter(author_id=author_id), 'pk')
+        for author_id in pulled
+    ])
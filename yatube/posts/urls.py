@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -12,6 +12,7 @@ urlpatterns = [
     path('posts/<int:pk>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:pk>/comment/', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -22,4 +23,9 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_post, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/posts/<int:pk>/', api.post_detail, name='api_post_detail'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
 ]
@@ -1,8 +1,20 @@
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
 from django.core.paginator import Paginator
 from .models import Post, Group, User, Comment, Follow
+from core.cache import versioned_cache_page
+from core.http import conditional
 from .forms import PostForm, CommentForm
+from . import thumbnails
+from .follows import follow, unfollow
+from .freshness import (for_viewer, group_freshness, group_scopes,
+                        index_freshness, index_scopes, post_freshness,
+                        post_scopes, profile_freshness, profile_scopes)
+from .paginators import CURSOR_PARAM, CursorPaginator
+from .search import search_posts
+from .uploads import bounded_uploads
+from .timeline import timeline_posts
 
 
 def authorized_only(func):
@@ -14,29 +26,45 @@ def authorized_only(func):
 
 
 POSTS_PER_PAGE = 10
-TIME_OF_CASHING = 20
 
 
-@cache_page(TIME_OF_CASHING)
+def get_page(request, post_list):
+    """Страница ленты: по номеру или, если включено, по курсору."""
+    if CURSOR_PARAM in request.GET or settings.POSTS_CURSOR_PAGINATION:
+        paginator = CursorPaginator(post_list, POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
+    paginator = Paginator(post_list, POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def paginate(request, post_list):
+    """Страница ленты вместе с миниатюрами картинок."""
+    page_obj = get_page(request, post_list)
+    thumbnails.prefetch(page_obj)
+    return page_obj
+
+
+@conditional(for_viewer(index_freshness))
+@versioned_cache_page(
+    index_scopes, *settings.PAGE_CACHE_TIMEOUTS['index'])
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@conditional(for_viewer(group_freshness))
+@versioned_cache_page(
+    group_scopes, *settings.PAGE_CACHE_TIMEOUTS['group_list'])
 def group_post(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed().filter(group=group)
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -44,13 +72,15 @@ def group_post(request, slug):
     return render(request, template, context)
 
 
+@conditional(for_viewer(profile_freshness))
+@versioned_cache_page(
+    profile_scopes, *settings.PAGE_CACHE_TIMEOUTS['profile'])
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    post_list = author.posts.feed()
+    page_obj = paginate(request, post_list)
     user = request.user
     following = False
     if user.is_authenticated and Follow.objects.filter(
@@ -64,10 +94,13 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@conditional(for_viewer(post_freshness))
+@versioned_cache_page(
+    post_scopes, *settings.PAGE_CACHE_TIMEOUTS['post_detail'])
 def post_detail(request, pk):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post.objects, pk=pk)
-    comments = Comment.objects.filter(post=post)
+    post = get_object_or_404(Post.objects.feed(), pk=pk)
+    comments = Comment.objects.filter(post=post).select_related('author')
     form_comment = CommentForm(request.POST or None)
     post_obj = Post.objects.all()
     context = {
@@ -79,7 +112,9 @@ def post_detail(request, pk):
     return render(request, template, context)
 
 
+@bounded_uploads
 @authorized_only
+@transaction.atomic
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -91,6 +126,8 @@ def post_create(request):
     return redirect('posts:profile', username=request.user)
 
 
+@bounded_uploads
+@transaction.atomic
 def post_edit(request, pk):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=pk)
@@ -115,6 +152,7 @@ def post_edit(request, pk):
 
 
 @authorized_only
+@transaction.atomic
 def add_comment(request, pk):
     post = get_object_or_404(Post, pk=pk)
     form = CommentForm(request.POST or None)
@@ -129,31 +167,40 @@ def add_comment(request, pk):
 @authorized_only
 def follow_index(request):
     template = 'posts/follow.html'
-    authors = Follow.objects.filter(user=request.user).values_list(
-        'author', flat=True)
-    post_list = Post.objects.filter(author__in=authors)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = timeline_posts(request.user)
+    page_obj = paginate(request, post_list)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(search_posts(query), POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        thumbnails.prefetch(page_obj)
     context = {
+        'query': query,
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 @authorized_only
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if (request.user != author):
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+    follow(request.user, [author])
     return redirect('posts:follow_index')
 
 
 @authorized_only
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    unfollow(request.user, [author])
     return redirect('posts:follow_index')
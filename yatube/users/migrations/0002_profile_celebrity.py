@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    Profile.objects.filter(
+        followers_count__gte=settings.TIMELINE_CELEBRITY_THRESHOLD
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='celebrity',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Знаменитость'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
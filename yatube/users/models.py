@@ -1,3 +1,29 @@
-# from django.db import models
+from django.contrib.auth import get_user_model
+from django.db import models
 
-# Create your models here.
+User = get_user_model()
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0, editable=False, db_index=True)
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0, editable=False)
+    # Посты автора подмешиваются в ленты при чтении (см. posts.timeline)
+    celebrity = models.BooleanField(
+        'Знаменитость', default=False, editable=False)
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
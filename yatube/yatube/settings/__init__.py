@@ -0,0 +1,14 @@
+"""Настройки проекта.
+
+Профиль выбирается переменной окружения YATUBE_ENV:
+dev (по умолчанию) - DEBUG и debug toolbar, шаблоны читаются заново
+на каждый запрос;
+prod - без DEBUG и отладочных приложений, шаблоны в кэше, соединения
+с базой живут между запросами.
+"""
+import os
+
+if os.getenv('YATUBE_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,269 @@
+"""Общие настройки профилей dev и prod (см. __init__.py)."""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'dxidnm=y7==7tum85dt-(_r1k6vsbj)$21e9e($8kqt(so+xu6'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about',
+    'sorl.thumbnail',
+    'django.contrib.staticfiles',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'OPTIONS': {
+            # Шаблон разбирается один раз на процесс, а не на каждый
+            # запрос; wsgi.py разбирает шаблоны проекта заранее.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+# Параметры базы задаются переменными окружения YATUBE_DB_*; без них -
+# SQLite в каталоге проекта (транзакции с BEGIN IMMEDIATE, см.
+# core.db.backends.sqlite3). Для PostgreSQL с пулом соединений:
+# YATUBE_DB_ENGINE=core.db.backends.postgresql_pool.
+DATABASES = {
+    'default': {
+        'ENGINE': os.getenv('YATUBE_DB_ENGINE', 'core.db.backends.sqlite3'),
+        'NAME': os.getenv(
+            'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.getenv('YATUBE_DB_USER', ''),
+        'PASSWORD': os.getenv('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.getenv('YATUBE_DB_HOST', ''),
+        'PORT': os.getenv('YATUBE_DB_PORT', ''),
+        # Сколько секунд соединение живёт между запросами: 0 - новое
+        # на каждый запрос.
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 0)),
+        # Проверять постоянное соединение при первом обращении в запросе
+        # (core.db.backends.health)
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('YATUBE_DB_POOL_MIN', 1)),
+            'MAX_SIZE': int(os.getenv('YATUBE_DB_POOL_MAX', 10)),
+            # Сколько секунд ждать свободное соединение
+            'TIMEOUT': int(os.getenv('YATUBE_DB_POOL_TIMEOUT', 30)),
+        },
+    }
+}
+
+# Выполняются для каждого нового соединения с SQLite. В режиме WAL
+# читатели не ждут писателя; synchronous=NORMAL в WAL не теряет
+# целостность, а fsync делается только при checkpoint.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Сколько миллисекунд ждать, пока другой писатель (запрос или
+    # фоновый поток) отпустит базу
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 2 ** 20,
+    # Отрицательное значение - размер в КиБ
+    'cache_size': -64 * 2 ** 10,
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+# LOGOUT_REDIRECT_URL = 'posts:index'
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Режим кэша задаётся переменной окружения YATUBE_CACHE:
+# local - свой кэш в памяти каждого процесса,
+# shared - общий для всех процессов кэш,
+# tiered - короткоживущий кэш процесса перед общим.
+# Общим кэшем без отдельного сервера служит файловый с атомарным add;
+# для Redis или memcached достаточно задать YATUBE_SHARED_CACHE_BACKEND
+# и YATUBE_SHARED_CACHE_LOCATION. На add общего кэша держатся
+# блокировки, поэтому бэкенд без атомарного add (например, обычный
+# FileBasedCache) для него не годится.
+CACHE_MODE = os.getenv('YATUBE_CACHE', 'local')
+CACHES = {
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'YATUBE_SHARED_CACHE_BACKEND',
+            'core.cache_backends.LockingFileBasedCache',
+        ),
+        'LOCATION': os.getenv(
+            'YATUBE_SHARED_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache'),
+        ),
+    },
+    'tiered': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'LOCAL_TIMEOUT': 5},
+    },
+}
+if CACHE_MODE not in CACHES:
+    raise ImproperlyConfigured(
+        f'Неизвестный режим кэша YATUBE_CACHE={CACHE_MODE!r}: '
+        f'нужен один из local, shared, tiered.')
+CACHES['default'] = CACHES[CACHE_MODE]
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Пределы для картинок постов: размер файла, число пикселей и сторона,
+# до которой картинка уменьшается при загрузке.
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 2560
+
+# Миниатюры строятся в фоне после сохранения поста, страницы отдают
+# только готовые (см. posts.thumbnails).
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# Метаданные миниатюр ленты загружаются одной пачкой на страницу.
+THUMBNAIL_KVSTORE = 'posts.thumbnails.PrefetchKVStore'
+
+# Потоки для работы вне запроса (core.background): построение
+# миниатюр, раскладка постов бывших знаменитостей по лентам. С SQLite
+# больше одного писателя не нужно.
+BACKGROUND_WORKERS = 1
+
+# Страницы лент кэшируются вместе с версиями данных: версии меняются
+# сигналами при записи, поэтому время жизни может быть долгим.
+# Для каждого вида - (свежая, предельная): после первого срока или
+# смены версии страницу перестраивает один запрос, остальные до
+# второго срока получают прежнюю.
+PAGE_CACHE_TIMEOUTS = {
+    'index': (60 * 60, 24 * 60 * 60),
+    'group_list': (60 * 60, 24 * 60 * 60),
+    'profile': (60 * 60, 24 * 60 * 60),
+    'post_detail': (10 * 60, 60 * 60),
+}
+
+# Листать ленты по курсору (pub_date, pk) вместо номеров страниц.
+# Включается и для отдельного запроса параметром ?cursor=
+POSTS_CURSOR_PAGINATION = False
+
+# Сколько записей ленты подписок вставлять за один INSERT.
+TIMELINE_BATCH_SIZE = 500
+# С какого числа подписчиков посты автора не раскладываются по лентам,
+# а подмешиваются в ленту при чтении, и ниже какого числа снова
+# раскладываются (в фоновом потоке).
+TIMELINE_CELEBRITY_THRESHOLD = 10000
+TIMELINE_CELEBRITY_RELEASE_THRESHOLD = 9000
+
+# Сколько постов или комментариев обрабатывать за один запрос в
+# массовых действиях модераторов.
+MODERATION_BATCH_SIZE = 1000
+
+# Бэкенд поиска по постам: на SQLite - индекс FTS5, на других базах
+# пока поиск без индекса.
+SEARCH_BACKEND = (
+    'posts.search.SqliteBackend'
+    if DATABASES['default']['ENGINE'].endswith('sqlite3')
+    else 'posts.search.SimpleBackend'
+)
@@ -0,0 +1,21 @@
+import copy
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+# Новые списки, а не += : списки из base остаются без debug_toolbar
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+# Копия: словарь из base остаётся с кэшем шаблонов
+TEMPLATES = copy.deepcopy(TEMPLATES)
+# Правки шаблонов видны без перезапуска; YATUBE_CACHED_TEMPLATES=1
+# включает кэш шаблонов, как в prod.
+if os.getenv('YATUBE_CACHED_TEMPLATES') != '1':
+    del TEMPLATES[0]['OPTIONS']['loaders']
+    TEMPLATES[0]['APP_DIRS'] = True
@@ -0,0 +1,22 @@
+import copy
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = os.environ['YATUBE_SECRET_KEY']
+
+if os.getenv('YATUBE_ALLOWED_HOSTS'):
+    ALLOWED_HOSTS = os.environ['YATUBE_ALLOWED_HOSTS'].split(',')
+
+# Соединение с базой живёт между запросами столько секунд. С пулом
+# (core.db.backends.postgresql_pool) всегда 0: соединение возвращается
+# в пул в конце запроса. Копия, чтобы не менять словарь из base.
+DATABASES = copy.deepcopy(DATABASES)
+if DATABASES['default']['ENGINE'] == 'core.db.backends.postgresql_pool':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('YATUBE_CONN_MAX_AGE', 60))
+
+# Картинки постов (MEDIA_ROOT) отдаёт веб-сервер перед приложением.
@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import serve_media
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
@@ -17,6 +19,7 @@ handler500 = 'core.views.internal_server_error'
 if settings.DEBUG:
     import debug_toolbar
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL, view=serve_media,
+        document_root=settings.MEDIA_ROOT
     )
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
\ No newline at end of file